@@ -0,0 +1,54 @@
+import os
+import random
+import subprocess
+
+import numpy as np
+
+WORDS = (
+    "retrieval augmented generation vector database embedding index query "
+    "document chunk parent child sparse dense hybrid fusion rerank latency "
+    "throughput postgres qdrant minio upload page source context answer "
+    "invoice contract policy report revenue margin customer supplier audit "
+    "quarter forecast budget compliance security incident release roadmap"
+).split()
+
+
+def synthetic_text(rng: random.Random, num_chars: int) -> str:
+    words = []
+    length = 0
+    while length < num_chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def percentiles(samples: list[float]) -> dict:
+    """
+    Latency summary in milliseconds for samples given in seconds.
+    """
+    if not samples:
+        return {"count": 0}
+    values = np.array(samples) * 1000
+    return {
+        "count": len(samples),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p90_ms": float(np.percentile(values, 90)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean()),
+        "max_ms": float(values.max()),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
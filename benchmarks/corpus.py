@@ -0,0 +1,116 @@
+"""
+Synthetic TXT, PDF and DOCX corpora for the ingestion benchmarks.
+"""
+import os
+import random
+import zipfile
+import textwrap
+from xml.sax.saxutils import escape
+
+from benchmarks.common import synthetic_text
+
+DOCX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+
+DOCX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+
+def write_txt(path: str, pages: list[str]) -> None:
+    with open(path, "w") as f:
+        f.write("\n\n".join(pages))
+
+
+def write_docx(path: str, pages: list[str]) -> None:
+    paragraphs = "".join(
+        f"<w:p><w:r><w:t>{escape(paragraph)}</w:t></w:r></w:p>"
+        for page in pages
+        for paragraph in textwrap.wrap(page, 400)
+    )
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{paragraphs}</w:body></w:document>"
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", DOCX_CONTENT_TYPES)
+        z.writestr("_rels/.rels", DOCX_RELS)
+        z.writestr("word/document.xml", document)
+
+
+def _pdf_string(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: list[str]) -> None:
+    """
+    Writes a minimal text-only PDF with one page per entry of `pages`.
+    """
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    page_ids = []
+    for i, text in enumerate(pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        lines = " ".join(f"({_pdf_string(line)}) Tj T*" for line in textwrap.wrap(text, 95))
+        stream = f"BT /F1 9 Tf 11 TL 40 760 Td {lines} ET"
+        objects[content_id] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+        objects[page_id] = (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        page_ids.append(page_id)
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[2] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(out)
+        out += f"{object_id} 0 obj\n{objects[object_id]}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    size = max(objects) + 1
+    out += f"xref\n0 {size}\n0000000000 65535 f \n".encode()
+    for object_id in range(1, size):
+        out += f"{offsets[object_id]:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+WRITERS = {
+    "txt": write_txt,
+    "pdf": write_pdf,
+    "docx": write_docx,
+}
+
+
+def write_corpus(
+    directory: str,
+    num_files: int,
+    pages_per_file: int,
+    formats: list[str],
+    page_chars: int = 3000,
+    seed: int = 0,
+) -> list[str]:
+    """
+    Writes `num_files` files per format into `directory`.
+    Returns:
+        The written file paths.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for fmt in formats:
+        for i in range(num_files):
+            pages = [synthetic_text(rng, page_chars) for _ in range(pages_per_file)]
+            path = os.path.join(directory, f"doc_{i:03d}.{fmt}")
+            WRITERS[fmt](path, pages)
+            paths.append(path)
+    return paths
@@ -0,0 +1,391 @@
+"""
+In-process stand-ins for the external services and models used by the
+benchmarks: an in-memory docstore, an in-memory MinIO client, thread-safe
+in-memory Qdrant clients (sync and async), hashing embeddings, a token-overlap cross-encoder
+and an OpenAI-compatible completions server.
+"""
+import re
+import copy
+import json
+import time
+import socket
+import asyncio
+import hashlib
+import threading
+from typing import Any, AsyncIterator, BinaryIO, Iterator, Optional, Sequence
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant.sparse_embeddings import SparseEmbeddings, SparseVector
+from langchain_community.cross_encoders.base import BaseCrossEncoder
+
+from src.docstore import PostgresStore
+from src.qdrant import InstrumentedQdrantClient, InstrumentedAsyncQdrantClient
+from src.minio_client import MinioClient
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class InMemoryDocStore(PostgresStore):
+    """
+    PostgresStore backed by a dict. `latency_ms` is added to every async call
+    to model the database round trip.
+    """
+    def __init__(self, link_documents: bool = True, key_field: str = "doc_id", latency_ms: float = 0.0):
+        super().__init__(
+            sync_session_factory=None,
+            async_session_factory=None,
+            link_documents=link_documents,
+            key_field=key_field,
+        )
+        self.latency = latency_ms / 1000
+        self.round_trips = 0
+        self._values: dict[str, dict] = {}
+        self._keys_by_pair: dict[tuple[str, int], str] = {}
+
+    async def _round_trip(self) -> None:
+        self.round_trips += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _get(self, key: str) -> Optional[Document]:
+        value = self._values.get(key)
+        if value is None:
+            return None
+        return self.deserialize_document(copy.deepcopy(value), key=key)
+
+    def mget(self, keys: Sequence[str]) -> list[Optional[Document]]:
+        return [self._get(key) for key in keys]
+
+    async def amget(self, keys: Sequence[str]) -> list[Optional[Document]]:
+        await self._round_trip()
+        return self.mget(keys)
+
+    def mset(self, key_value_pairs: Sequence[tuple[str, Document]]) -> int:
+        rows = dict(self.serialize_pairs(key_value_pairs))
+        for key, value in rows.items():
+            self._values[key] = value
+            pair = self._lookup_pair(value["metadata"])
+            if pair is not None:
+                self._keys_by_pair[pair] = key
+        return len(rows)
+
+    async def amset(self, key_value_pairs: Sequence[tuple[str, Document]]) -> int:
+        # One round trip per upsert statement
+        for _ in range(0, len(key_value_pairs), self.write_batch_size):
+            await self._round_trip()
+        return self.mset(key_value_pairs)
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        for key in keys:
+            value = self._values.pop(key, None)
+            if value is not None:
+                self._keys_by_pair.pop(self._lookup_pair(value["metadata"]), None)
+
+    async def amdelete(self, keys: Sequence[str]) -> None:
+        await self._round_trip()
+        self.mdelete(keys)
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        for key in list(self._values):
+            if not prefix or key.startswith(prefix):
+                yield key
+
+    async def ayield_keys(self, *, prefix: Optional[str] = None) -> AsyncIterator[str]:
+        await self._round_trip()
+        for key in self.yield_keys(prefix=prefix):
+            yield key
+
+    def get_key_by_value(self, value: dict) -> Optional[str]:
+        return self.get_keys_by_values([value])[0]
+
+    async def aget_key_by_value(self, value: Document) -> Optional[str]:
+        return (await self.aget_keys_by_values([value]))[0]
+
+    def get_keys_by_values(self, values: Sequence[dict]) -> list[Optional[str]]:
+        pairs = [self._lookup_pair(value.get("metadata", {})) for value in values]
+        return [self._keys_by_pair.get(pair) if pair else None for pair in pairs]
+
+    async def aget_keys_by_values(self, values: Sequence[Document]) -> list[Optional[str]]:
+        await self._round_trip()
+        pairs = [self._lookup_pair(value.metadata) for value in values]
+        return [self._keys_by_pair.get(pair) if pair else None for pair in pairs]
+
+    async def amget_neighbors(
+        self, documents: Sequence[Document]
+    ) -> tuple[list[Optional[str]], dict[str, Document]]:
+        await self._round_trip()
+        keys = [
+            doc.metadata.get(self.key_field)
+            or self._keys_by_pair.get(self._lookup_pair(doc.metadata))
+            for doc in documents
+        ]
+        neighbors = {}
+        for doc in documents:
+            for key_field in ("prev_key", "next_key"):
+                key = doc.metadata.get(key_field)
+                if key and key in self._values:
+                    neighbors[key] = self._get(key)
+        return keys, neighbors
+
+
+class InMemoryMinioClient(MinioClient):
+    """
+    MinioClient keeping objects in a dict. Each call waits `latency_ms` and
+    transfers at `mb_per_s` (0 for unlimited), blocking like the real client;
+    the inherited a* methods run it on the storage executor.
+    """
+    def __init__(self, latency_ms: float = 0.0, mb_per_s: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.bytes_per_s = mb_per_s * 1024 * 1024
+        self.objects: dict[tuple[str, str], bytes] = {}
+        self._lock = threading.Lock()
+
+    def _transfer(self, size: int) -> None:
+        delay = self.latency + (size / self.bytes_per_s if self.bytes_per_s else 0.0)
+        if delay:
+            time.sleep(delay)
+
+    def _put(self, bucket_name: str, object_name: str, data: BinaryIO) -> None:
+        content = data.read()
+        self._transfer(len(content))
+        with self._lock:
+            self.objects[(bucket_name, object_name)] = content
+
+    def upload_file(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: BinaryIO,
+        content_type: str = "application/octet-stream",
+    ):
+        data.seek(0)
+        self._put(bucket_name, object_name, data)
+
+    def upload_stream(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: BinaryIO,
+        content_type: str = "application/octet-stream",
+        part_size: Optional[int] = None,
+    ):
+        self._put(bucket_name, object_name, data)
+
+    def download_file(self, bucket_name: str, object_name: str, file_path: str):
+        with self._lock:
+            content = self.objects[(bucket_name, object_name)]
+        self._transfer(len(content))
+        with open(file_path, "wb") as f:
+            f.write(content)
+
+
+class _Serialized:
+    """
+    Proxy serializing every method call on `target` with a lock.
+    """
+    def __init__(self, target: Any):
+        self._target = target
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return call
+
+
+def in_memory_qdrant_client() -> QdrantClient:
+    """
+    Local-mode QdrantClient that is safe to share between executor threads
+    (local mode itself is not thread-safe).
+    """
+    client = InstrumentedQdrantClient(":memory:")
+    client._client = _Serialized(client._client)
+    return client
+
+
+class _Threaded:
+    """
+    Async facade running every method of a sync `target` in a thread.
+    """
+    def __init__(self, target: Any):
+        self._target = target
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(attr, *args, **kwargs)
+        return call
+
+
+def in_memory_async_qdrant_client(client: QdrantClient) -> AsyncQdrantClient:
+    """
+    AsyncQdrantClient over the same local-mode storage as `client` (from
+    `in_memory_qdrant_client`), so sync and async calls see the same points.
+    """
+    async_client = InstrumentedAsyncQdrantClient(":memory:")
+    async_client._client = _Threaded(client._client)
+    return async_client
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Dense embeddings from signed feature hashing of word tokens.
+    """
+    def __init__(self, size: int = 384):
+        self.size = size
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in tokenize(text):
+            h = token_hash(token)
+            vector[h % self.size] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+class HashingSparseEmbeddings(SparseEmbeddings):
+    """
+    Sparse term-frequency vectors over hashed word tokens.
+    """
+    def __init__(self, num_features: int = 2 ** 20):
+        self.num_features = num_features
+
+    def _embed(self, text: str) -> SparseVector:
+        counts: dict[int, float] = {}
+        for token in tokenize(text):
+            index = token_hash(token) % self.num_features
+            counts[index] = counts.get(index, 0.0) + 1.0
+        indices = sorted(counts)
+        return SparseVector(indices=indices, values=[counts[i] for i in indices])
+
+    def embed_documents(self, texts: list[str]) -> list[SparseVector]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> SparseVector:
+        return self._embed(text)
+
+
+class OverlapCrossEncoder(BaseCrossEncoder):
+    """
+    Scores pairs by token overlap. `pair_ms` of busy work per pair models the
+    cost of a real cross-encoder.
+    """
+    model_name = "overlap"
+
+    def __init__(self, pair_ms: float = 0.0):
+        self.pair_ms = pair_ms
+
+    def score(self, text_pairs: list[tuple[str, str]]) -> list[float]:
+        scores = []
+        for query, document in text_pairs:
+            if self.pair_ms:
+                deadline = time.perf_counter() + self.pair_ms / 1000
+                while time.perf_counter() < deadline:
+                    pass
+            q, d = set(tokenize(query)), set(tokenize(document))
+            scores.append(len(q & d) / len(q | d) if q | d else 0.0)
+        return scores
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class FakeLLMServer:
+    """
+    OpenAI-compatible /v1/completions server running in a background thread.
+
+    Query rewrite prompts are answered with the question itself marked valid;
+    every other prompt streams `num_tokens` tokens, the first after `ttft_ms`
+    and the rest `token_ms` apart.
+    """
+    question_pattern = re.compile(r"### Current question:\s*(.*?)\s*## Assistant:", re.S)
+
+    def __init__(self, ttft_ms: float = 50.0, token_ms: float = 10.0, num_tokens: int = 64):
+        self.ttft = ttft_ms / 1000
+        self.token_interval = token_ms / 1000
+        self.num_tokens = num_tokens
+        self.port = free_port()
+        self.app = FastAPI()
+        self.app.post("/v1/completions")(self.completions)
+        self.server = uvicorn.Server(
+            uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning")
+        )
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def start(self) -> "FakeLLMServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+    def _tokens(self, prompt: str) -> tuple[list[str], float]:
+        match = self.question_pattern.search(prompt)
+        if match:
+            answer = json.dumps({"valid": "true", "output": match.group(1)}) + "\n```"
+            return [answer], 0.0
+        return [f" token{i}" for i in range(self.num_tokens)], self.token_interval
+
+    async def completions(self, request: Request):
+        body = await request.json()
+        prompt = body.get("prompt", "")
+        prompt = prompt[0] if isinstance(prompt, list) else prompt
+        tokens, interval = self._tokens(prompt)
+
+        def chunk(text: str, finish_reason: Optional[str] = None) -> str:
+            return "data: " + json.dumps({
+                "id": "cmpl-fake",
+                "object": "text_completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"text": text, "index": 0, "logprobs": None, "finish_reason": finish_reason}],
+            }) + "\n\n"
+
+        async def stream():
+            await asyncio.sleep(self.ttft)
+            for i, token in enumerate(tokens):
+                if i and interval:
+                    await asyncio.sleep(interval)
+                yield chunk(token)
+            yield chunk("", "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
@@ -0,0 +1,422 @@
+"""
+HTTP load test for the API server. Serves the real `main.app` with uvicorn
+in-process, with local stand-ins for MinIO (in memory), Qdrant (in memory)
+and the LLM (a fake OpenAI-compatible server), and drives it with an async
+load generator mixing uploads, file listing and chat.
+
+Postgres is the one real dependency: point POSTGRES_URL at a scratch
+database initialised with postgres/ragstore.sql (e.g. the docker compose
+service). Uploaded files are deleted again at the end unless --keep-files.
+
+For each concurrency level of the sweep, the generator runs for --duration
+seconds, either closed-loop (each of `concurrency` workers sends the next
+request when the previous one completes) or open-loop at --rate requests/s
+with at most `concurrency` in flight, and reports throughput, latency
+percentiles, time to first token and error rates per scenario as JSON.
+
+Usage:
+    python -m benchmarks.loadtest --concurrency 1,4,16 --duration 30
+    python -m benchmarks.loadtest --rate 20 --concurrency 32 --mix chat=1
+    python -m benchmarks.loadtest --server-url http://localhost:8000
+"""
+import sys
+import json
+import time
+import uuid
+import types
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+import uvicorn
+
+from benchmarks.common import synthetic_text, percentiles, git_commit
+from benchmarks.corpus import write_corpus
+from benchmarks.fakes import (
+    InMemoryMinioClient,
+    in_memory_qdrant_client,
+    in_memory_async_qdrant_client,
+    free_port,
+    FakeLLMServer,
+)
+
+CHAT_PATH = "/chat"
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "txt": "text/plain",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+
+def standin_builder(args, llm_base_url: str) -> types.ModuleType:
+    """
+    Builds a replacement for `src.builder` wired to the local stand-ins with
+    the same `build_components` as production. Must be installed in
+    sys.modules before `main` is imported.
+    """
+    from dataclasses import fields
+
+    from src.qdrant import InstrumentedQdrantClient, InstrumentedAsyncQdrantClient
+    from src.llm import LLMProcessor
+    from src.components import build_components
+    from src.config import NUM_PREDICT
+    from benchmarks.pipeline import build_models
+
+    model_dense, model_sparse, model_rerank, embedding_size = build_models(args)
+    if args.qdrant_url:
+        qdrant_client = InstrumentedQdrantClient(url=args.qdrant_url)
+        async_qdrant_client = InstrumentedAsyncQdrantClient(url=args.qdrant_url)
+    else:
+        qdrant_client = in_memory_qdrant_client()
+        async_qdrant_client = in_memory_async_qdrant_client(qdrant_client)
+    processor = LLMProcessor(base_url=llm_base_url, api_key="benchmark", model=args.llm_model)
+    # max_tokens=-1 sizes the completion with tiktoken, which needs network access
+    processor.llm.max_tokens = NUM_PREDICT
+    components = build_components(
+        qdrant_client=qdrant_client,
+        async_qdrant_client=async_qdrant_client,
+        mc=InMemoryMinioClient(latency_ms=args.minio_latency_ms, mb_per_s=args.minio_mb_per_s),
+        model_dense=model_dense,
+        model_sparse=model_sparse,
+        model_rerank=model_rerank,
+        embedding_size=embedding_size,
+        processor=processor,
+        answer_cache_enabled=False,
+    )
+
+    builder = types.ModuleType("src.builder")
+    builder.components = components
+    for field in fields(components):
+        setattr(builder, field.name, getattr(components, field.name))
+    return builder
+
+
+class InProcessServer:
+    """
+    Runs `main.app` with uvicorn on its own event loop in a background thread.
+    """
+    def __init__(self, app, port: int):
+        self.port = port
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+        )
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "InProcessServer":
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("API server failed to start")
+            time.sleep(0.05)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def serve_app(args, llm_base_url: str) -> InProcessServer:
+    sys.modules["src.builder"] = standin_builder(args, llm_base_url)
+    from main import app
+    return InProcessServer(app, port=free_port()).start()
+
+
+@dataclass
+class Sample:
+    scenario: str
+    ok: bool
+    status: Optional[int]
+    latency: float
+    ttft: Optional[float] = None
+    error: Optional[str] = None
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        mix: dict[str, float],
+        files: list[tuple[str, bytes]],
+        queries: list[str],
+        chat_path: str = CHAT_PATH,
+        expand_context: bool = False,
+        wait_ingestion: bool = False,
+        seed: int = 0,
+    ):
+        self.client = client
+        self.scenarios = list(mix)
+        self.weights = [mix[name] for name in self.scenarios]
+        self.files = files
+        self.queries = queries
+        self.chat_path = chat_path
+        self.expand_context = expand_context
+        self.wait_ingestion = wait_ingestion
+        self.rng = random.Random(seed)
+        self.samples: list[Sample] = []
+        self.uploaded: dict[str, Optional[str]] = {}
+
+    async def _request(self, scenario: str, method: str, url: str, ok_status: int, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.samples.append(Sample(scenario, False, None, time.perf_counter() - start, error=type(e).__name__))
+            return None
+        ok = response.status_code == ok_status
+        self.samples.append(Sample(scenario, ok, response.status_code, time.perf_counter() - start))
+        return response if ok else None
+
+    async def upload(self) -> None:
+        ext, content = self.rng.choice(self.files)
+        filename = f"loadtest_{uuid.uuid4().hex}.{ext}"
+        response = await self._request(
+            "upload", "POST", "/files/upload", 202,
+            files={"file": (filename, content, CONTENT_TYPES[ext])},
+        )
+        if response is None:
+            return
+        status_url = response.json().get("status_url")
+        self.uploaded[filename] = status_url
+        if self.wait_ingestion and status_url:
+            start = time.perf_counter()
+            job = await self.wait_for_job(status_url)
+            self.samples.append(Sample(
+                "ingest",
+                job is not None and job["status"] == "succeeded",
+                None,
+                time.perf_counter() - start,
+                error=None if job is None else job.get("error"),
+            ))
+
+    async def list_files(self) -> None:
+        await self._request("list", "GET", "/files/", 200, params={"limit": 10})
+
+    async def chat(self) -> None:
+        body = {"message": self.rng.choice(self.queries), "expand_context": self.expand_context}
+        start = time.perf_counter()
+        ttft = None
+        try:
+            async with self.client.stream("POST", self.chat_path, json=body) as response:
+                error = None
+                async for line in response.aiter_lines():
+                    if line == "event: token" and ttft is None:
+                        ttft = time.perf_counter() - start
+                    elif line == "event: error":
+                        error = "error event"
+                status = response.status_code
+        except httpx.HTTPError as e:
+            self.samples.append(Sample("chat", False, None, time.perf_counter() - start, error=type(e).__name__))
+            return
+        self.samples.append(Sample(
+            "chat", status == 200 and error is None, status, time.perf_counter() - start, ttft=ttft, error=error
+        ))
+
+    async def wait_for_job(self, status_url: str, timeout: float = 600.0, interval: float = 0.1) -> Optional[dict]:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            try:
+                response = await self.client.get(status_url)
+                job = response.json()
+                if job.get("status") in ("succeeded", "failed"):
+                    return job
+            except (httpx.HTTPError, ValueError):
+                pass
+            await asyncio.sleep(interval)
+        return None
+
+    async def _one(self) -> None:
+        scenario = self.rng.choices(self.scenarios, weights=self.weights)[0]
+        if scenario == "upload":
+            await self.upload()
+        elif scenario == "list":
+            await self.list_files()
+        else:
+            await self.chat()
+
+    async def run_level(self, concurrency: int, duration: float, rate: float = 0.0) -> dict:
+        self.samples = []
+        start = time.perf_counter()
+        deadline = start + duration
+        if rate > 0:
+            # Open loop: Poisson arrivals, at most `concurrency` in flight;
+            # arrivals waiting for a slot count towards latency
+            slots = asyncio.Semaphore(concurrency)
+
+            async def arrival():
+                async with slots:
+                    await self._one()
+
+            tasks = []
+            while time.perf_counter() < deadline:
+                tasks.append(asyncio.create_task(arrival()))
+                await asyncio.sleep(self.rng.expovariate(rate))
+            await asyncio.gather(*tasks)
+        else:
+            async def worker():
+                while time.perf_counter() < deadline:
+                    await self._one()
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        return {"concurrency": concurrency, "rate": rate, "elapsed_s": elapsed, **self.summarize(elapsed)}
+
+    def summarize(self, elapsed: float) -> dict:
+        summary = {"total": self._stats(self.samples, elapsed), "scenarios": {}}
+        for scenario in sorted({s.scenario for s in self.samples}):
+            samples = [s for s in self.samples if s.scenario == scenario]
+            summary["scenarios"][scenario] = self._stats(samples, elapsed)
+        return summary
+
+    @staticmethod
+    def _stats(samples: list[Sample], elapsed: float) -> dict:
+        ok = [s for s in samples if s.ok]
+        errors = Counter(s.error or str(s.status) for s in samples if not s.ok)
+        stats = {
+            "requests": len(samples),
+            "throughput_rps": len(ok) / elapsed if elapsed else None,
+            "error_rate": (len(samples) - len(ok)) / len(samples) if samples else 0.0,
+            "errors": dict(errors),
+            "latency": percentiles([s.latency for s in ok]),
+        }
+        ttft = [s.ttft for s in ok if s.ttft is not None]
+        if ttft:
+            stats["ttft"] = percentiles(ttft)
+        return stats
+
+    async def cleanup(self) -> None:
+        # Let pending ingestion finish so deletes find the indexed file
+        await asyncio.gather(*(self.wait_for_job(url) for url in self.uploaded.values() if url))
+        for filename in self.uploaded:
+            try:
+                await self.client.delete(f"/files/{filename}")
+            except httpx.HTTPError:
+                pass
+        self.uploaded = {}
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in ("upload", "list", "chat"):
+            raise argparse.ArgumentTypeError(f"Unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def load_files(args) -> list[tuple[str, bytes]]:
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(
+            directory,
+            num_files=args.upload_files,
+            pages_per_file=args.pages,
+            formats=args.formats.split(","),
+            seed=args.seed,
+        )
+        files = []
+        for path in paths:
+            with open(path, "rb") as f:
+                files.append((path.rsplit(".", 1)[-1], f.read()))
+    return files
+
+
+async def sweep(args, base_url: str) -> list[dict]:
+    rng = random.Random(args.seed)
+    queries = [synthetic_text(rng, 60) for _ in range(200)]
+    levels = [int(c) for c in args.concurrency.split(",")]
+    limits = httpx.Limits(max_connections=max(levels) * 2, max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        generator = LoadGenerator(
+            client,
+            mix=args.mix,
+            files=load_files(args),
+            queries=queries,
+            chat_path=args.chat_path,
+            expand_context=args.expand_context,
+            wait_ingestion=args.wait_ingestion,
+            seed=args.seed,
+        )
+        results = []
+        try:
+            for concurrency in levels:
+                results.append(await generator.run_level(concurrency, args.duration, args.rate))
+        finally:
+            if not args.keep_files:
+                await generator.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="comma-separated sweep levels")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per level")
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop arrivals/s (0 for closed loop)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("chat=6,list=3,upload=1"))
+    parser.add_argument("--expand-context", action="store_true")
+    parser.add_argument("--wait-ingestion", action="store_true", help="also time uploads until their job finishes")
+    parser.add_argument("--upload-files", type=int, default=2, help="distinct files per format")
+    parser.add_argument("--pages", type=int, default=5, help="pages per uploaded file")
+    parser.add_argument("--formats", default="pdf,txt,docx")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--keep-files", action="store_true")
+    parser.add_argument("--server-url", default=None, help="load an already running server instead")
+    parser.add_argument("--chat-path", default=CHAT_PATH)
+    parser.add_argument("--qdrant-url", default=None, help="local Qdrant instead of in-memory")
+    parser.add_argument("--minio-latency-ms", type=float, default=5.0)
+    parser.add_argument("--minio-mb-per-s", type=float, default=200.0)
+    parser.add_argument("--models", choices=["fake", "real"], default="fake")
+    parser.add_argument("--embedding-size", type=int, default=384, help="fake dense embedding size")
+    parser.add_argument("--rerank-pair-ms", type=float, default=2.0, help="fake cross-encoder cost per pair")
+    parser.add_argument("--llm-model", default="fake")
+    parser.add_argument("--llm-ttft-ms", type=float, default=200.0)
+    parser.add_argument("--llm-token-ms", type=float, default=20.0)
+    parser.add_argument("--llm-tokens", type=int, default=128)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    llm = server = None
+    base_url = args.server_url
+    try:
+        if base_url is None:
+            llm = FakeLLMServer(
+                ttft_ms=args.llm_ttft_ms,
+                token_ms=args.llm_token_ms,
+                num_tokens=args.llm_tokens,
+            ).start()
+            server = serve_app(args, llm.base_url)
+            base_url = server.url
+        levels = asyncio.run(sweep(args, base_url))
+    finally:
+        if server is not None:
+            server.stop()
+        if llm is not None:
+            llm.stop()
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {**vars(args), "server_url": args.server_url},
+        "levels": levels,
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Offline benchmark suite for the RAG pipeline. Runs end to end against an
+in-memory Qdrant collection, an in-memory docstore and a local fake LLM
+server, and reports as JSON:
+
+- ingestion throughput (pages/s parsed, chunks/s embedded, points/s upserted)
+  over a synthetic PDF/TXT/DOCX corpus,
+- retrieve() latency percentiles for each retrieval mode x rerank mode x
+  context expansion,
+- generate() time to first token and total time.
+
+Models are deterministic hashing/overlap stand-ins by default; pass
+`--models real` to load the configured embedding and reranking models.
+
+Usage:
+    python -m benchmarks.pipeline --files 4 --pages 10 --output before.json
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from collections import Counter
+from datetime import datetime, timezone
+
+from langchain_qdrant import RetrievalMode
+
+from src.qdrant import AsyncQdrantVectorStore, create_collection
+from src.loader import FileLoader
+from src.retriever import RetrieverFactory
+from src.rag import RAGPipeline
+from src.llm import LLMProcessor
+from src.config import NUM_PREDICT, SPECULATIVE_RETRIEVAL
+from benchmarks.common import synthetic_text, percentiles, git_commit
+from benchmarks.corpus import write_corpus
+from benchmarks.fakes import (
+    InMemoryDocStore,
+    in_memory_qdrant_client,
+    in_memory_async_qdrant_client,
+    HashingEmbeddings,
+    HashingSparseEmbeddings,
+    OverlapCrossEncoder,
+    FakeLLMServer,
+)
+
+COLLECTION = "benchmark"
+RETRIEVAL_MODES = {
+    "dense": RetrievalMode.DENSE,
+    "sparse": RetrievalMode.SPARSE,
+    "hybrid": RetrievalMode.HYBRID,
+}
+
+
+def build_models(args):
+    if args.models == "real":
+        from src.models import model_dense, model_sparse, model_rerank
+        from src.config import EMBEDDING_SIZE
+        return model_dense, model_sparse, model_rerank, EMBEDDING_SIZE
+    return (
+        HashingEmbeddings(size=args.embedding_size),
+        HashingSparseEmbeddings(),
+        OverlapCrossEncoder(pair_ms=args.rerank_pair_ms),
+        args.embedding_size,
+    )
+
+
+async def bench_ingestion(pipeline: RAGPipeline, paths: list[str]) -> dict:
+    counts = Counter()
+    load_time = index_time = 0.0
+    file_samples = []
+    for path in paths:
+        start = time.perf_counter()
+        documents = await pipeline.aload(path)
+        loaded = time.perf_counter()
+        await pipeline.index(documents, on_progress=lambda stage, n: counts.update({stage: n}))
+        indexed = time.perf_counter()
+        counts["pages"] += len(documents)
+        load_time += loaded - start
+        index_time += indexed - loaded
+        file_samples.append(indexed - start)
+    return {
+        "files": len(paths),
+        "pages": counts["pages"],
+        "chunks": counts["chunks_total"],
+        "points": counts["points_upserted"],
+        "parents": counts["parents_stored"],
+        "load_s": load_time,
+        "index_s": index_time,
+        "pages_per_s": counts["pages"] / load_time if load_time else None,
+        "chunks_per_s": counts["chunks_embedded"] / index_time if index_time else None,
+        "points_per_s": counts["points_upserted"] / index_time if index_time else None,
+        "file": percentiles(file_samples),
+    }
+
+
+async def bench_retrieval(
+    pipeline: RAGPipeline,
+    docstore: InMemoryDocStore,
+    queries: list[str],
+    expand_context: bool,
+    warmup: int,
+) -> dict:
+    for query in queries[:warmup]:
+        await pipeline.retrieve(query, expand_context=expand_context)
+    samples = []
+    round_trips = docstore.round_trips
+    for query in queries:
+        start = time.perf_counter()
+        await pipeline.retrieve(query, expand_context=expand_context)
+        samples.append(time.perf_counter() - start)
+    result = percentiles(samples)
+    result["docstore_round_trips_per_query"] = (docstore.round_trips - round_trips) / len(queries)
+    return result
+
+
+async def bench_generation(pipeline: RAGPipeline, queries: list[str], warmup: int) -> dict:
+    ttft, total = [], []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        first = None
+        async for _ in pipeline.generate(query):
+            if first is None:
+                first = time.perf_counter()
+        end = time.perf_counter()
+        if i < warmup:
+            continue
+        ttft.append((first or end) - start)
+        total.append(end - start)
+    return {"ttft": percentiles(ttft), "total": percentiles(total)}
+
+
+async def run(args) -> dict:
+    model_dense, model_sparse, model_rerank, embedding_size = build_models(args)
+
+    client = in_memory_qdrant_client()
+    async_client = in_memory_async_qdrant_client(client)
+    create_collection(client=client, collection_name=COLLECTION, embedding_size=embedding_size)
+    vectorstores = {
+        mode: AsyncQdrantVectorStore(
+            client=client,
+            async_client=async_client,
+            collection_name=COLLECTION,
+            embedding=model_dense,
+            sparse_embedding=model_sparse,
+            retrieval_mode=retrieval_mode,
+            vector_name="dense",
+            sparse_vector_name="sparse",
+        )
+        for mode, retrieval_mode in RETRIEVAL_MODES.items()
+    }
+    docstore = InMemoryDocStore(latency_ms=args.docstore_latency_ms)
+
+    server = None
+    base_url = args.llm_base_url
+    if base_url is None:
+        server = FakeLLMServer(
+            ttft_ms=args.llm_ttft_ms,
+            token_ms=args.llm_token_ms,
+            num_tokens=args.llm_tokens,
+        ).start()
+        base_url = server.base_url
+    processor = LLMProcessor(base_url=base_url, api_key="benchmark", model=args.llm_model)
+    # max_tokens=-1 sizes the completion with tiktoken, which needs network access
+    processor.llm.max_tokens = NUM_PREDICT
+
+    loader = FileLoader()
+    index_retriever = RetrieverFactory(vectorstores["hybrid"], docstore).create(rerank=False)
+
+    def make_pipeline(mode: str, rerank: str) -> RAGPipeline:
+        query_retriever = RetrieverFactory(vectorstores[mode], docstore).create(
+            rerank=rerank != "off",
+            model_rerank=model_rerank,
+            cascade=rerank == "cascade",
+        )
+        return RAGPipeline(
+            processor=processor,
+            loader=loader,
+            vectorstore=vectorstores[mode],
+            docstore=docstore,
+            query_retriever=query_retriever,
+            index_retriever=index_retriever,
+        )
+
+    rng = random.Random(args.seed)
+    queries = [synthetic_text(rng, 60) for _ in range(args.queries)]
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {**vars(args), "speculative_retrieval": SPECULATIVE_RETRIEVAL},
+    }
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = write_corpus(
+                directory,
+                num_files=args.files,
+                pages_per_file=args.pages,
+                formats=args.formats.split(","),
+                page_chars=args.page_chars,
+                seed=args.seed,
+            )
+            results["ingestion"] = await bench_ingestion(make_pipeline("hybrid", "off"), paths)
+
+        results["retrieval"] = []
+        for mode in args.modes.split(","):
+            for rerank in args.rerank.split(","):
+                pipeline = make_pipeline(mode, rerank)
+                for expand in args.expand.split(","):
+                    stats = await bench_retrieval(
+                        pipeline, docstore, queries, expand_context=expand == "on", warmup=args.warmup
+                    )
+                    results["retrieval"].append(
+                        {"mode": mode, "rerank": rerank, "expand_context": expand == "on", **stats}
+                    )
+
+        results["generation"] = await bench_generation(
+            make_pipeline("hybrid", args.generation_rerank), queries, warmup=args.warmup
+        )
+    finally:
+        if server is not None:
+            server.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", choices=["fake", "real"], default="fake")
+    parser.add_argument("--embedding-size", type=int, default=384, help="fake dense embedding size")
+    parser.add_argument("--rerank-pair-ms", type=float, default=2.0, help="fake cross-encoder cost per pair")
+    parser.add_argument("--files", type=int, default=4, help="files per format")
+    parser.add_argument("--pages", type=int, default=10, help="pages per file")
+    parser.add_argument("--page-chars", type=int, default=3000)
+    parser.add_argument("--formats", default="pdf,txt,docx")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--modes", default="dense,sparse,hybrid")
+    parser.add_argument("--rerank", default="off,full,cascade")
+    parser.add_argument("--expand", default="off,on")
+    parser.add_argument("--generation-rerank", default="full")
+    parser.add_argument("--docstore-latency-ms", type=float, default=1.0, help="simulated round trip per docstore call")
+    parser.add_argument("--llm-base-url", default=None, help="use a running OpenAI-compatible server instead of the fake")
+    parser.add_argument("--llm-model", default="fake")
+    parser.add_argument("--llm-ttft-ms", type=float, default=50.0)
+    parser.add_argument("--llm-token-ms", type=float, default=10.0)
+    parser.add_argument("--llm-tokens", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Rerank latency benchmark: scores k (query, candidate) pairs per query with
+each reranking backend and reports latency percentiles as JSON.
+
+Usage:
+    python -m benchmarks.rerank --k 20 --iterations 20
+"""
+import json
+import time
+import random
+import argparse
+
+from src.config import RERANKING_MODEL, PARENT_CHUNK_SIZE
+from src.reranker import FastCrossEncoder
+from benchmarks.common import synthetic_text, percentiles
+
+
+def run(scorer, queries: list[str], candidates: list[list[str]], warmup: int = 2) -> dict:
+    for query, docs in zip(queries[:warmup], candidates[:warmup]):
+        scorer.score([(query, doc) for doc in docs])
+    samples = []
+    for query, docs in zip(queries, candidates):
+        start = time.perf_counter()
+        scorer.score([(query, doc) for doc in docs])
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=RERANKING_MODEL)
+    parser.add_argument("--k", type=int, default=20, help="candidates per query")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--chunk-chars", type=int, default=PARENT_CHUNK_SIZE)
+    parser.add_argument("--backends", default="baseline,torch,torch-int8,onnx,onnx-int8")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = [synthetic_text(rng, 60) for _ in range(args.iterations)]
+    candidates = [
+        [synthetic_text(rng, rng.randint(args.chunk_chars // 4, args.chunk_chars)) for _ in range(args.k)]
+        for _ in range(args.iterations)
+    ]
+
+    results = {"model": args.model, "k": args.k, "iterations": args.iterations, "backends": {}}
+    for name in args.backends.split(","):
+        if name == "baseline":
+            from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+            scorer = HuggingFaceCrossEncoder(model_name=args.model, model_kwargs={"trust_remote_code": True})
+            config = scorer.client.model.config
+            if config.pad_token_id is None:
+                config.pad_token_id = scorer.client.tokenizer.pad_token_id
+        else:
+            backend, _, quantized = name.partition("-")
+            try:
+                scorer = FastCrossEncoder(args.model, backend=backend, quantize=quantized == "int8")
+            except Exception as e:
+                results["backends"][name] = {"error": f"{type(e).__name__}: {e}"}
+                continue
+        results["backends"][name] = run(scorer, queries, candidates)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
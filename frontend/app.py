@@ -1,15 +1,28 @@
 import ast
-import base64
+import asyncio
+import httpx
 import chainlit as cl
 import chainlit.data as cl_data
 from chainlit.data.sql_alchemy import SQLAlchemyDataLayer
+from typing import Optional
 from sqlalchemy import select
 
 from src.builder import pipeline
-from src.config import CHAINLIT_DB_URL
+from src.answer_cache import replay_answer
+from src.streaming import coalesce
+from src.utils import format_chat_history
+from src.config import CHAINLIT_DB_URL, PROFILING_ENABLED, BACKEND_URL, BACKEND_INTERNAL_URL
+from src.logger import logger, request_id
+from src.profiler import profiled
 from src.db.session import AsyncSessionFactory
 from src.db.models import UploadedFile
 
+# Messages starting with this are answered with the profiler on
+PROFILE_PREFIX = "/profile "
+# Ingestion progress of uploads is polled from the API server
+JOB_POLL_INTERVAL = 1.0
+JOB_POLL_MAX_FAILURES = 5
+
 conninfo = f"postgresql+asyncpg://{CHAINLIT_DB_URL}"
 cl_data._data_layer = SQLAlchemyDataLayer(conninfo=conninfo, ssl_require=False)
 
@@ -61,11 +74,21 @@ def on_stop():
 
 @cl.on_message
 async def on_message(message: cl.Message):
+    request_id.set(message.id)
+    user_message = message.content
+    profile = PROFILING_ENABLED and user_message.startswith(PROFILE_PREFIX)
+    if profile:
+        user_message = user_message[len(PROFILE_PREFIX):].lstrip()
+    async with profiled("chat", message.id, enabled=profile) as session:
+        await answer(user_message)
+    if session:
+        await cl.Message(content=f"Profile written to `{session.path}`").send()
+
+async def answer(user_message: str):
     history = cl.user_session.get("history")
     pipeline = cl.user_session.get("pipeline")
     processor = cl.user_session.get("processor")    
-    chat_history = "\n".join(f"{item['role'].capitalize()}: {item['content']}" for item in history[-5:])
-    user_message = message.content
+    chat_history = format_chat_history(history)
     history.append(
         {
             "role": "user",
@@ -74,9 +97,11 @@ async def on_message(message: cl.Message):
     )
     rewritten_query = ""
     async with cl.Step("Query Rewrite") as step:
-        rewritten_query, fallback_message = await processor.query_rewrite(
+        # Retrieval may start speculatively while the query is rewritten
+        rewritten_query, fallback_message, sources, cached, corpus_version = await pipeline.rewrite_and_retrieve(
             chat_history=chat_history,
-            message=user_message
+            message=user_message,
+            expand_context=False
         )
         step.output = rewritten_query if rewritten_query else "Not applicable"
 
@@ -86,25 +111,35 @@ async def on_message(message: cl.Message):
         await response.send()
     else:
         cl.user_session.set("stop", False)
-        sources = await pipeline.retrieve(rewritten_query, expand_context=False)
-        context = processor.build_context(sources)
-        stream = processor.final_answer(message=rewritten_query, context=context)
+        if cached:
+            stream = replay_answer(cached.answer)
+        else:
+            context = processor.build_context(sources)
+            stream = processor.final_answer(message=rewritten_query, context=context)
         response = cl.Message(content="")
-        res = ""
-        async for chunk in stream:
-            if cl.user_session.get("stop"):
-                break
-            res += chunk
-            await response.stream_token(chunk)
+        parts = []
+        # One websocket message per frame of tokens rather than per token
+        async for frame in coalesce(stream, stop=lambda: cl.user_session.get("stop")):
+            parts.append(frame)
+            await response.stream_token(frame)
+        res = "".join(parts)
+        stopped = cl.user_session.get("stop")
+        if not cached and not stopped:
+            await pipeline.store_answer(rewritten_query, res, sources, corpus_version)
         elements = []
         names = []
         for i, source in enumerate(sources):
             name = f"Source {i}: {source.get('name')} (page {source.get('page')})"
-            content = source.get("content")
             names.append(name)
-            element = cl.Text(
-                content=content, name=name, display="side"
-            )
+            if source.get("key"):
+                # The browser fetches the content when the panel is opened
+                element = cl.Text(
+                    url=f"{BACKEND_URL}/sources/{source['key']}", name=name, display="side"
+                )
+            else:
+                element = cl.Text(
+                    content=source.get("content"), name=name, display="side"
+                )
             elements.append(element)
         names = "\n".join(names)
         result = f"{res}\n\nSources:\n{names}"
@@ -156,27 +191,78 @@ async def confirm_delete_file(action: cl.Action):
 
 @cl.action_callback("upload_file_action")
 async def upload_file_action(action: cl.Action):
-    element = cl.CustomElement(name="UploadFileModal", props={})
+    # The browser uploads the file to the API server itself
+    element = cl.CustomElement(name="UploadFileModal", props={"uploadUrl": f"{BACKEND_URL}/files/upload"})
     await cl.Message(
         content="Select a file to upload:",
         elements=[element]
     ).send()
 
+def format_job_progress(filename: str, job: dict) -> str:
+    stages = job.get("stages", {})
+    if job["status"] == "queued":
+        return f"File '{filename}' uploaded, waiting to be indexed..."
+    return (
+        f"Indexing '{filename}': {stages.get('pages_parsed', 0)} pages parsed, "
+        f"{stages.get('chunks_embedded', 0)}/{stages.get('chunks_total', 0)} chunks embedded"
+    )
+
+async def wait_for_job(job_id: str, on_update) -> Optional[dict]:
+    """
+    Polls an ingestion job on the API server until it finishes, passing each
+    intermediate state to `on_update`. Returns None if the job cannot be read.
+    """
+    failures = 0
+    async with httpx.AsyncClient(base_url=BACKEND_INTERNAL_URL, timeout=10) as client:
+        while True:
+            try:
+                response = await client.get(f"/files/jobs/{job_id}")
+                response.raise_for_status()
+                job = response.json()
+                failures = 0
+            except httpx.HTTPError as e:
+                failures += 1
+                if failures >= JOB_POLL_MAX_FAILURES:
+                    logger.error(f"Failed to poll ingestion job {job_id}: {e}")
+                    return None
+            else:
+                if job["status"] in ("succeeded", "failed"):
+                    return job
+                await on_update(job)
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
 @cl.action_callback("confirm_upload_file")
 async def confirm_upload_file(action: cl.Action):
     filename = action.payload.get("filename")
-    file_data = action.payload.get("file")
-    if filename and file_data:
-        # Decode the base64 to bytes
-        content = base64.b64decode(file_data.split(",")[1])
-        size_kb = len(content) / 1024  # size in KB
-        # TODO: Implement file upload logic (use `upload_file` from src.api.file)
-        await cl.Message(
-            content=f"File '{filename}' uploaded successfully ({size_kb:.2f} KB)"
-        ).send()
-    else:
+    job_id = action.payload.get("job_id")
+    if not filename:
         await cl.Message(content="No file selected.").send()
+        return
+    if not job_id:
+        error = action.payload.get("error", "Unknown error")
+        await cl.Message(content=f"Upload of '{filename}' failed: {error}").send()
+        return
+    message = cl.Message(content=f"File '{filename}' uploaded, waiting to be indexed...")
+    await message.send()
+
+    async def on_update(job: dict):
+        content = format_job_progress(filename, job)
+        if content != message.content:
+            message.content = content
+            await message.update()
 
+    job = await wait_for_job(job_id, on_update)
+    if job is None:
+        message.content = f"File '{filename}' uploaded, but its indexing status is unavailable."
+    elif job["status"] == "succeeded":
+        stages = job["stages"]
+        message.content = (
+            f"File '{filename}' indexed: {stages['pages_parsed']} pages, "
+            f"{stages['chunks_total']} chunks."
+        )
+    else:
+        message.content = f"Indexing '{filename}' failed: {job.get('error')}"
+    await message.update()
 
 if __name__ == "__main__":
 
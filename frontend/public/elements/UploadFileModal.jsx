@@ -4,24 +4,46 @@ import { Button } from "@/components/ui/button";
 export default function UploadFileModal(props) {
   const [file, setFile] = useState(null);
   const [uploaded, setUploaded] = useState(false);
+  const [progress, setProgress] = useState(null);
 
-  const handleUpload = async () => {
+  const handleUpload = () => {
     if (!file) return;
-
-    // Convert file to base64 to send via payload
-    const base64 = await new Promise((resolve, reject) => {
-      const reader = new FileReader();
-      reader.readAsDataURL(file);
-      reader.onload = () => resolve(reader.result);
-      reader.onerror = (error) => reject(error);
-    });
-
-    callAction({
-      name: "confirm_upload_file",
-      payload: { filename: file.name, file: base64 },
-    });
-
     setUploaded(true);
+    setProgress(0);
+
+    // Multipart POST straight to the API server: the browser streams the file
+    // from disk, so nothing is base64-encoded or sent over the websocket
+    const form = new FormData();
+    form.append("file", file);
+    const xhr = new XMLHttpRequest();
+    xhr.open("POST", props.uploadUrl);
+    xhr.upload.onprogress = (e) => {
+      if (e.lengthComputable) setProgress(Math.round((e.loaded / e.total) * 100));
+    };
+    xhr.onload = () => {
+      let body = {};
+      try {
+        body = JSON.parse(xhr.responseText);
+      } catch (e) {}
+      if (xhr.status === 202) {
+        callAction({
+          name: "confirm_upload_file",
+          payload: { filename: file.name, job_id: body.job_id },
+        });
+      } else {
+        callAction({
+          name: "confirm_upload_file",
+          payload: { filename: file.name, error: body.detail || `HTTP ${xhr.status}` },
+        });
+      }
+    };
+    xhr.onerror = () => {
+      callAction({
+        name: "confirm_upload_file",
+        payload: { filename: file.name, error: "Network error" },
+      });
+    };
+    xhr.send(form);
   };
 
   return (
@@ -41,6 +63,20 @@ export default function UploadFileModal(props) {
         }}
       />
 
+      {progress !== null && (
+        <div style={{ height: "6px", borderRadius: "3px", backgroundColor: "#2e2e2e" }}>
+          <div
+            style={{
+              height: "100%",
+              width: `${progress}%`,
+              borderRadius: "3px",
+              backgroundColor: "#e5e5e5",
+              transition: "width 0.2s",
+            }}
+          />
+        </div>
+      )}
+
       {!uploaded && (
         <Button
           onClick={handleUpload}
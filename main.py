@@ -1,16 +1,93 @@
+import time
+import uuid
 import uvicorn
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
-from src.config import PORT
+from src.config import PORT, REQUEST_ID_HEADER, CORS_ORIGINS, WEB_CONCURRENCY
+from src.logger import request_id
+from src.metrics import registry
+from src.profiler import profile_requested, start_profile, stop_after
+from src.builder import ingestion_queue
 from src.api.file import router as file_router
+from src.api.chat import router as chat_router
+from src.api.source import router as source_router
+
+http_requests = registry.counter(
+    "http_requests_total",
+    "HTTP requests handled",
+    labelnames=("method", "route", "status"),
+)
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response starts",
+    labelnames=("method", "route"),
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WEB_CONCURRENCY > 1:
+        # Another worker would not see this one's jobs, e.g. GET /files/jobs/{id} returns 404
+        raise RuntimeError(
+            f"WEB_CONCURRENCY={WEB_CONCURRENCY}: the API server keeps ingestion jobs in "
+            "memory and must run as a single worker"
+        )
+    await ingestion_queue.start()
+    yield
+    await ingestion_queue.stop()
 
 app = FastAPI(
     title="API Server",
     version="1.0.0",
     description="API Server",
+    lifespan=lifespan,
 )
 
+# The Chainlit UI fetches source panels and uploads files from the browser
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=CORS_ORIGINS,
+    allow_methods=["GET", "POST"],
+)
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    # Correlate log lines of this request (and the ingestion job it queues)
+    rid = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+    token = request_id.set(rid)
+    start = time.perf_counter()
+    status = 500
+    profile = start_profile(f"{request.method} {request.url.path}", rid) if profile_requested(request) else None
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers[REQUEST_ID_HEADER] = rid
+        if profile:
+            # Profile until the (possibly streamed) body is sent
+            response.headers["X-Profile-Path"] = profile.path
+            response.body_iterator = stop_after(response.body_iterator, profile)
+        return response
+    except Exception:
+        if profile:
+            await profile.astop()
+        raise
+    finally:
+        request_id.reset(token)
+        if registry.enabled:
+            # Route templates keep label cardinality bounded
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            http_requests.labels(method=request.method, route=route, status=status).inc()
+            http_request_seconds.labels(method=request.method, route=route).observe(time.perf_counter() - start)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.exposition(), media_type="text/plain; version=0.0.4")
+
 app.include_router(file_router, prefix="/files", tags={"Files"})
+app.include_router(chat_router, prefix="/chat", tags={"Chat"})
+app.include_router(source_router, prefix="/sources", tags={"Sources"})
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=PORT)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=PORT)
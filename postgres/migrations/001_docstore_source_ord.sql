@@ -0,0 +1,10 @@
+-- Adds indexed (source, ord) lookup columns to an existing docstore table.
+-- Generated columns are computed for existing rows when the column is added.
+
+ALTER TABLE public.docstore
+	ADD COLUMN IF NOT EXISTS "source" text GENERATED ALWAYS AS (value->'metadata'->>'source') STORED;
+
+ALTER TABLE public.docstore
+	ADD COLUMN IF NOT EXISTS ord int4 GENERATED ALWAYS AS (((value->'metadata'->>'order'))::int4) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS docstore_source_ord_idx ON public.docstore USING btree ("source", ord);
@@ -0,0 +1,11 @@
+-- Adds the single-row corpus version counter, bumped whenever files are
+-- uploaded or deleted. Used to invalidate cached answers.
+
+CREATE TABLE IF NOT EXISTS public.corpus_version (
+	id int4 NOT NULL DEFAULT 1,
+	"version" int8 NOT NULL DEFAULT 0,
+	CONSTRAINT corpus_version_pkey PRIMARY KEY (id),
+	CONSTRAINT corpus_version_single_row CHECK (id = 1)
+);
+
+INSERT INTO public.corpus_version (id, "version") VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
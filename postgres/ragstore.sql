@@ -7,9 +7,12 @@ CREATE TABLE public.docstore (
 	id serial4 NOT NULL,
 	"key" text NOT NULL,
 	value jsonb NULL,
+	"source" text GENERATED ALWAYS AS (value->'metadata'->>'source') STORED,
+	ord int4 GENERATED ALWAYS AS (((value->'metadata'->>'order'))::int4) STORED,
 	CONSTRAINT docstore_key_key UNIQUE ("key"),
 	CONSTRAINT documents_pkey PRIMARY KEY (id)
 );
+CREATE INDEX docstore_source_ord_idx ON public.docstore USING btree ("source", ord);
 
 -- public.file definition
 -- Drop table
@@ -25,6 +28,18 @@ CREATE TABLE public.file (
 	CONSTRAINT uploaded_files_pkey PRIMARY KEY (id)
 );
 
+-- public.corpus_version definition
+-- Drop table
+-- DROP TABLE public.corpus_version;
+
+CREATE TABLE public.corpus_version (
+	id int4 NOT NULL DEFAULT 1,
+	"version" int8 NOT NULL DEFAULT 0,
+	CONSTRAINT corpus_version_pkey PRIMARY KEY (id),
+	CONSTRAINT corpus_version_single_row CHECK (id = 1)
+);
+INSERT INTO public.corpus_version (id, "version") VALUES (1, 0);
+
 -- public.thread definition
 -- Drop table
 -- DROP TABLE public.thread;
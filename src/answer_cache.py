@@ -0,0 +1,160 @@
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Awaitable, Callable, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.cache import estimate_size
+from src.metrics import registry
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    answer: str
+    sources: list[dict]
+    corpus_version: int
+    expand_context: bool = False
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticAnswerCache:
+    """
+    Caches final answers keyed on the embedding of the rewritten query.
+
+    A lookup hits when a cached query has cosine similarity >= `threshold`
+    and was answered against the current corpus version. Whenever the corpus
+    version changes (files uploaded or deleted) all entries are dropped, so
+    stale answers are never served. Entries are evicted LRU once their
+    estimated size exceeds `max_bytes`.
+    """
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        version_provider: Callable[[], Awaitable[int]],
+        threshold: float = 0.95,
+        max_bytes: int = 32 * 1024 * 1024,
+    ):
+        self.embeddings = embeddings
+        self.version_provider = version_provider
+        self.threshold = threshold
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.version: Optional[int] = None
+        self._entries: OrderedDict[int, tuple[np.ndarray, CachedAnswer, int]] = OrderedDict()
+        self._next_id = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: list[int] = []
+        self._lock = threading.Lock()
+        self.hits = registry.counter("answer_cache_hits_total", "Answer cache hits")
+        self.misses = registry.counter("answer_cache_misses_total", "Answer cache misses")
+        self.evictions = registry.counter("answer_cache_evictions_total", "Answer cache evictions")
+
+    async def _embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(await self.embeddings.aembed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm != 0 else vector
+
+    async def sync_version(self) -> int:
+        """
+        Reads the current corpus version, dropping all entries if it changed.
+        """
+        version = await self.version_provider()
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self._matrix = None
+                self.bytes = 0
+                self.version = version
+        return version
+
+    async def alookup(
+        self,
+        query: str,
+        expand_context: bool = False,
+        version: Optional[int] = None,
+    ) -> Optional[CachedAnswer]:
+        if version is None:
+            version, vector = await asyncio.gather(self.sync_version(), self._embed(query))
+        else:
+            vector = await self._embed(query)
+        with self._lock:
+            if not self._entries or version != self.version:
+                self.misses.inc()
+                return None
+            if self._matrix is None:
+                self._matrix_ids = list(self._entries)
+                self._matrix = np.stack([self._entries[i][0] for i in self._matrix_ids])
+            similarities = self._matrix @ vector
+            for index in np.argsort(-similarities):
+                if similarities[index] < self.threshold:
+                    break
+                entry_id = self._matrix_ids[index]
+                entry = self._entries[entry_id][1]
+                if entry.expand_context == expand_context:
+                    self._entries.move_to_end(entry_id)
+                    self.hits.inc()
+                    return entry
+            self.misses.inc()
+            return None
+
+    async def astore(
+        self,
+        query: str,
+        answer: str,
+        sources: list[dict],
+        corpus_version: int,
+        expand_context: bool = False,
+    ) -> None:
+        """
+        Caches an answer whose sources were retrieved at `corpus_version`
+        (as returned by `sync_version` before retrieval). It is dropped if
+        the corpus has changed since, as the answer may already be stale.
+        """
+        version, vector = await asyncio.gather(self.sync_version(), self._embed(query))
+        if version != corpus_version:
+            return
+        entry = CachedAnswer(
+            query=query,
+            answer=answer,
+            sources=sources,
+            corpus_version=corpus_version,
+            expand_context=expand_context,
+        )
+        size = vector.nbytes + estimate_size(answer) + estimate_size(sources)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if corpus_version != self.version:
+                return
+            self._entries[self._next_id] = (vector, entry, size)
+            self._next_id += 1
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions.inc()
+            self._matrix = None
+
+    def stats(self) -> dict:
+        total = self.hits.value + self.misses.value
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "corpus_version": self.version,
+            "hit_rate": self.hits.value / total if total else 0.0,
+        }
+
+
+async def replay_answer(answer: str, chunk_size: int = 16) -> AsyncGenerator[str, None]:
+    """
+    Replays a cached answer as a stream of small chunks.
+    """
+    for i in range(0, len(answer), chunk_size):
+        yield answer[i:i + chunk_size]
+        await asyncio.sleep(0)
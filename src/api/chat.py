@@ -0,0 +1,67 @@
+import json
+from typing import Literal
+from pydantic import BaseModel, Field
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+
+from src.builder import pipeline
+from src.utils import format_chat_history
+from src.logger import logger
+
+router = APIRouter()
+
+
+class ChatTurn(BaseModel):
+    role: Literal["user", "assistant"]
+    content: str
+
+
+class ChatRequest(BaseModel):
+    message: str
+    history: list[ChatTurn] = Field(default_factory=list)
+    expand_context: bool = False
+
+
+SOURCE_FIELDS = ("key", "name", "page")
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def chat_events(request: Request, body: ChatRequest):
+    """
+    Server-sent events for one chat turn: a `token` event per LLM chunk, then
+    `sources` and `done`, or `error` if the turn fails. Sources are sent as
+    references; their content is served by GET /sources/{key}.
+    """
+    sources = []
+    stream = pipeline.generate(
+        body.message,
+        chat_history=format_chat_history([turn.model_dump() for turn in body.history]),
+        expand_context=body.expand_context,
+        on_sources=sources.extend,
+    )
+    try:
+        async for chunk in stream:
+            if await request.is_disconnected():
+                logger.info("Client disconnected, cancelling chat stream")
+                return
+            yield sse("token", {"text": chunk})
+        yield sse("sources", [{field: source.get(field) for field in SOURCE_FIELDS} for source in sources])
+        yield sse("done", {})
+    except Exception as e:
+        logger.error(f"Chat stream failed: {e}")
+        yield sse("error", {"detail": "Internal Server Error"})
+    finally:
+        # Also runs when the response task is cancelled, stopping the LLM stream
+        await stream.aclose()
+
+
+@router.post("")
+async def chat(request: Request, body: ChatRequest):
+    return StreamingResponse(
+        chat_events(request, body),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
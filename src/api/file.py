@@ -2,15 +2,19 @@ import os
 import uuid
 import shutil
 import tempfile
-from fastapi import Query, APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import Query, APIRouter, Depends, HTTPException, Request, status, UploadFile, File
 from fastapi.responses import JSONResponse
 from sqlalchemy import text, select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.builder import mc, qdrant_client, pipeline
-from src.qdrant import delete_points_by_source
-from src.db.session import get_async_session
+from src.builder import mc, async_qdrant_client, pipeline, ingestion_queue, rerank_score_cache, source_cache
+from src.jobs import IngestionJob, QueueFullError
+from src.profiler import profile_requested
+from src.qdrant import adelete_points_by_source
+from src.spool import UploadSpool, spool_upload
+from src.db.session import get_async_session, AsyncSessionFactory
 from src.db.models import UploadedFile
+from src.crud.corpus import bump_corpus_version
 from src.logger import logger
 from src.config import (
     MINIO_BUCKET, 
@@ -64,8 +68,8 @@ async def delete_file(filename: str, session: AsyncSession = Depends(get_async_s
     # Delete from vectordb
     try:
         source = file.meta.get("vectordb_metadata_source") if file.meta else None
-        delete_points_by_source(
-            client=qdrant_client,
+        await adelete_points_by_source(
+            client=async_qdrant_client,
             collection_name=QDRANT_COLLECTION,
             source=source,
         )
@@ -80,15 +84,79 @@ async def delete_file(filename: str, session: AsyncSession = Depends(get_async_s
     
     # Delete from docstore
     await session.execute(
-        text("DELETE FROM docstore WHERE value->'metadata'->>'source' = :source"),
+        text("DELETE FROM docstore WHERE source = :source"),
         {"source": source}
     )
+    await bump_corpus_version(session)
     await session.commit()
     
+    # Drop cached rerank scores of the deleted chunks
+    if rerank_score_cache:
+        rerank_score_cache.invalidate_source(source)
+    if source_cache is not None:
+        source_cache.discard_where(lambda key, value: value["source"] == source)
+    
     return
 
-@router.post("/upload")
+async def ingest_file(
+    job: IngestionJob,
+    spool: UploadSpool,
+    object_name: str,
+) -> dict:
+    """
+    Ingestion job handler: parse the spooled file, index it and record the
+    uploaded file metadata. Partial index writes are removed on failure.
+    """
+    source = spool.path
+    try:
+        # Load file from the spool as langchain documents, off the event loop
+        documents = await pipeline.aload(source)
+        job.progress("pages_parsed", len(documents))
+        
+        # Index documents in vectorstore
+        await pipeline.index(documents=documents, on_progress=job.progress)
+        
+        # Update uploaded files metadata
+        metadata = {
+            "blob_storage_path": object_name,
+            "vectordb_metadata_source": source,
+        }
+        async with AsyncSessionFactory() as session:
+            session.add(UploadedFile(filename=job.filename, meta=metadata))
+            await bump_corpus_version(session)
+            await session.commit()
+    except Exception:
+        # Clean up
+        # Delete from vectorstore
+        await adelete_points_by_source(
+            client=async_qdrant_client,
+            collection_name=QDRANT_COLLECTION,
+            source=source,
+        )
+        
+        # Delete from docstore
+        async with AsyncSessionFactory() as session:
+            await session.execute(
+                text("DELETE FROM docstore WHERE source = :source"),
+                {"source": source}
+            )
+            await session.commit()
+        raise
+    finally:
+        spool.cleanup()
+    
+    return metadata
+
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    job = ingestion_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job.to_dict()
+
+@router.post("/upload", status_code=status.HTTP_202_ACCEPTED)
 async def upload_file_endpoint(
+    request: Request,
     file: UploadFile = File(...),
     session: AsyncSession = Depends(get_async_session)    
 ):
@@ -102,94 +170,71 @@ async def upload_file_endpoint(
             detail=f"Invalid file type. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
         )
     
-    # Check if file exists
+    # Check if file exists or is being ingested
     result = await session.execute(
         select(UploadedFile)
         .where(UploadedFile.filename == filename)
     )
     existing_file = result.scalars().first()
-    if existing_file:
+    # Reserving the name rejects concurrent uploads of the same file up front
+    if existing_file or not ingestion_queue.reserve(filename):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="A file with this name already exists. Please delete it before uploading a new version."
         )
-        
-    # Prepend UUID to the filename
-    prefix = ""
-    unique_filename = f"{uuid.uuid4().hex}_{filename}"
-    object_name = prefix + unique_filename
-    
-    # Set temporary directory
-    temp_dir = "/tmp"
-    temp_file_path = os.path.join(temp_dir, filename)
-    
-    try:
-        # Upload file.file (BinaryIO stream) directly
-        mc.upload_file( 
-            bucket_name=MINIO_BUCKET,
-            data=file.file,
-            object_name=object_name
-        )
-    except Exception as e:
-        logger.error(f"Upload to MinIO failed: {e}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
-    
-    try:
-        # Download file to temp dir
-        mc.download_file(
-            bucket_name=MINIO_BUCKET,
-            object_name=object_name,
-            file_path=temp_file_path
-        )
-        # Load file from local path as langchain documents
-        documents = pipeline.load(temp_file_path)
-        os.remove(temp_file_path)
-        
-        # Index documents in vectorstore
-        await pipeline.index(documents=documents)
-    
-    except Exception as e:
-        logger.error(f"Indexing failed: {e}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
-    
+
     try:
-        # Update uploaded files metadata
-        metadata = {
-            "blob_storage_path": object_name,
-            "vectordb_metadata_source": temp_file_path,
-        }
-        file_entry = UploadedFile(
-            filename=filename,
-            meta=metadata
-        )
-        session.add(file_entry)
-        await session.commit()
-    except Exception as e:
-        await session.rollback()
-        logger.error(f"Failed to save file metadata: {e}.")
-        
-        # Clean up
-        # Delete from vectorstore
-        delete_points_by_source(
-            client=qdrant_client,
-            collection_name=QDRANT_COLLECTION,
-            source=temp_file_path,
-        )
-        
-        # Delete from docstore
-        await session.execute(
-            text("DELETE FROM docstore WHERE value->'metadata'->>'source' = :source"),
-            {"source": temp_file_path}
-        )
-        await session.commit()
-        
-        raise HTTPException(status_code=500, detail="Internal Server Error")
-      
+        if ingestion_queue.full():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Ingestion queue is full. Please retry later."
+            )
+
+        # Prepend UUID to the filename
+        prefix = ""
+        unique_filename = f"{uuid.uuid4().hex}_{filename}"
+        object_name = prefix + unique_filename
+
+        try:
+            # Stream file.file to MinIO, teeing the bytes into a private spool for the loaders
+            spool = await spool_upload(
+                mc,
+                bucket_name=MINIO_BUCKET,
+                object_name=object_name,
+                source=file.file,
+                filename=filename,
+                content_type=file.content_type or "application/octet-stream"
+            )
+        except Exception as e:
+            logger.error(f"Upload to MinIO failed: {e}")
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+        # Parse, split, embed and index in the background
+        try:
+            job = ingestion_queue.submit(
+                filename,
+                lambda job: ingest_file(job, spool=spool, object_name=object_name),
+                profile=profile_requested(request),
+            )
+        except QueueFullError as e:
+            spool.cleanup()
+            logger.error(f"Failed to enqueue ingestion of {filename}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Ingestion queue is full. Please retry later."
+            )
+    finally:
+        # The pending job now holds the name, or the upload failed
+        ingestion_queue.release(filename)
+
     return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
         content={
+            "job_id": job.id,
             "original_filename": filename,
             "blob_storage_path": object_name,
-            "vectordb_metadata_source": temp_file_path,
-            "message": "File uploaded and indexed successfully!"
+            "vectordb_metadata_source": spool.path,
+            "status_url": request.url_for("get_ingestion_job", job_id=job.id).path,
+            "message": "File uploaded and queued for indexing."
         }
     )
@@ -0,0 +1,34 @@
+import hashlib
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Response, status
+from fastapi.responses import PlainTextResponse
+
+from src.builder import docstore, source_cache
+
+router = APIRouter()
+
+
+@router.get("/{key}", response_class=PlainTextResponse)
+async def get_source(key: str, if_none_match: Optional[str] = Header(None)):
+    """
+    Content of a retrieved source, fetched when its panel is opened.
+    """
+    cached = source_cache.get(key) if source_cache is not None else None
+    if cached is None:
+        [document] = await docstore.amget([key])
+        if document is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Source not found")
+        content = document.page_content.strip()
+        cached = {
+            "source": document.metadata.get("source"),
+            "content": content,
+            "etag": f'"{hashlib.sha1(content.encode()).hexdigest()}"',
+        }
+        if source_cache is not None:
+            source_cache.put(key, cached)
+    # Browsers revalidate on every open, so a source deleted with its file
+    # is not served from their cache; unchanged ones cost only a 304
+    headers = {"Cache-Control": "private, no-cache", "ETag": cached["etag"]}
+    if if_none_match and cached["etag"] in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return PlainTextResponse(cached["content"], headers=headers)
@@ -0,0 +1,122 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from src.logger import logger
+from src.metrics import registry
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUEUE_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+
+class EmbeddingBatcher:
+    """
+    Dynamic micro-batcher for query embeddings.
+
+    Concurrent `embed` calls are collected for up to `max_wait_ms` after the
+    first pending request, or until `max_batch_size` texts are pending, and
+    run through `embed_batch` as one forward pass on a dedicated thread.
+    Results are fanned back out to the waiting callers. Works for both sync
+    callers (e.g. vector stores running in executor threads) and async ones.
+    """
+    def __init__(
+        self,
+        embed_batch: Callable[[list[str]], list[Any]],
+        name: str,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 2.0,
+    ):
+        self.embed_batch = embed_batch
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: list[tuple[str, Future, float]] = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self.batch_size = registry.histogram(
+            f"embedding_batch_size_{name}",
+            f"Number of queries per {name} embedding batch",
+            buckets=BATCH_SIZE_BUCKETS,
+        )
+        self.queue_wait = registry.histogram(
+            f"embedding_queue_wait_seconds_{name}",
+            f"Time {name} queries wait for their batch to start",
+            buckets=QUEUE_WAIT_BUCKETS,
+        )
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"batcher-{self.name}", daemon=True
+                )
+                self._thread.start()
+            self._pending.append((text, future, time.perf_counter()))
+            self._condition.notify()
+        return future
+
+    def embed(self, text: str) -> Any:
+        return self.submit(text).result()
+
+    async def aembed(self, text: str) -> Any:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _next_batch(self) -> list[tuple[str, Future, float]]:
+        with self._condition:
+            while True:
+                while not self._pending:
+                    self._condition.wait()
+                deadline = self._pending[0][2] + self.max_wait
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._pending[:self.max_batch_size]
+                self._pending = self._pending[self.max_batch_size:]
+                # Drop requests whose callers already gave up (e.g. a cancelled
+                # aembed), as ThreadPoolExecutor does for its work items
+                batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+                if batch:
+                    return batch
+
+    def _run_batch(self, batch: list[tuple[str, Future, float]]) -> None:
+        started = time.perf_counter()
+        self.batch_size.observe(len(batch))
+        for _, _, enqueued in batch:
+            self.queue_wait.observe(started - enqueued)
+        try:
+            results = list(self.embed_batch([text for text, _, _ in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"{self.name} embedding batch returned {len(results)} results for {len(batch)} texts"
+                )
+        except Exception as e:
+            logger.error(f"Embedding batch failed in {self.name} batcher: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def _run(self) -> None:
+        # The worker must never die: callers would wait on their futures forever
+        while True:
+            batch = []
+            try:
+                batch = self._next_batch()
+                self._run_batch(batch)
+            except Exception as e:
+                logger.error(f"Unexpected error in {self.name} batcher: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def stats(self) -> dict:
+        return {
+            "batch_size": self.batch_size.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+        }
@@ -0,0 +1,172 @@
+import sys
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Sequence
+
+from src.metrics import registry
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalizes query text for cache keys: unicode NFKC, case-folded and with
+    whitespace collapsed.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Rough size in bytes of a cached value: lists of floats (dense vectors),
+    objects with indices/values (sparse vectors), strings and containers.
+    """
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    if hasattr(value, "indices") and hasattr(value, "values"):
+        return estimate_size(list(value.indices)) + estimate_size(list(value.values))
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by the estimated size of its entries.
+    Hits, misses and evictions are counted in the metrics registry under
+    `<name>_cache_*`.
+    """
+    def __init__(
+        self,
+        name: str,
+        max_bytes: int,
+        sizeof: Callable[[Any], int] = estimate_size,
+    ):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = registry.counter(f"{name}_cache_hits_total", f"{name} cache hits")
+        self.misses = registry.counter(f"{name}_cache_misses_total", f"{name} cache misses")
+        self.evictions = registry.counter(
+            f"{name}_cache_evictions_total", f"{name} cache evictions"
+        )
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses.inc()
+                return default
+            self._data.move_to_end(key)
+            self.hits.inc()
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._data[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions.inc()
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return None
+            self.bytes -= entry[1]
+            return entry[0]
+
+    def discard_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """
+        Removes all entries for which predicate(key, value) is true.
+        Returns the number of removed entries.
+        """
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(key, value)]
+            for key in keys:
+                self.bytes -= self._data.pop(key)[1]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits.value + self.misses.value
+        return self.hits.value / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits.value,
+            "misses": self.misses.value,
+            "evictions": self.evictions.value,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class RerankScoreCache:
+    """
+    Bounded cache of cross-encoder scores for (query, chunk) pairs, keyed on a
+    hash of the reranker model id, query text and chunk content. Entries
+    remember the chunk's source so they can be dropped when a file is deleted.
+    """
+    def __init__(self, max_entries: int):
+        # Entry-count bound: every entry has unit size
+        self.cache = LRUCache("rerank_score", max_bytes=max_entries, sizeof=lambda _: 1)
+
+    @staticmethod
+    def key(model_id: str, query: str, content: str) -> str:
+        digest = hashlib.sha1()
+        for part in (model_id, query, content):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def score(self, model, query: str, documents: Sequence) -> list[float]:
+        """
+        Scores `documents` against `query` with `model` (a BaseCrossEncoder),
+        sending only uncached pairs to the model.
+        """
+        model_id = getattr(model, "model_name", type(model).__name__)
+        keys = [self.key(model_id, query, doc.page_content) for doc in documents]
+        scores = []
+        for key in keys:
+            entry = self.cache.get(key)
+            scores.append(entry[0] if entry is not None else None)
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            new_scores = model.score([(query, documents[i].page_content) for i in missing])
+            for i, score in zip(missing, new_scores):
+                score = float(score)
+                scores[i] = score
+                self.cache.put(keys[i], (score, documents[i].metadata.get("source")))
+        return scores
+
+    def invalidate_source(self, source: str) -> int:
+        return self.cache.discard_where(lambda key, value: value[1] == source)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
@@ -0,0 +1,170 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant import RetrievalMode
+from qdrant_client import AsyncQdrantClient, QdrantClient
+
+from src.db.session import SyncSessionFactory, AsyncSessionFactory
+from src.crud.corpus import get_corpus_version
+from src.qdrant import AsyncQdrantVectorStore, create_collection
+from src.loader import FileLoader
+from src.docstore import PostgresStore
+from src.retriever import RetrieverFactory
+from src.cache import LRUCache, RerankScoreCache
+from src.rag import RAGPipeline, RetrieverLike
+from src.llm import LLMProcessor
+from src.answer_cache import SemanticAnswerCache
+from src.jobs import IngestionQueue
+from src.config import (
+    QDRANT_COLLECTION,
+    INGEST_QUEUE_SIZE,
+    INGEST_CONCURRENCY,
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_MB,
+    RERANK_ENABLED,
+    RERANK_MODE,
+    RERANK_CACHE_SIZE,
+    SOURCE_CACHE_MB,
+)
+
+
+@dataclass
+class Components:
+    """
+    Everything the API server and the UI are wired from. `src.builder` exposes
+    these as module attributes; the load test builds its own set around local
+    stand-ins for the external services.
+    """
+    qdrant_client: QdrantClient
+    async_qdrant_client: AsyncQdrantClient
+    mc: Any
+    loader: FileLoader
+    vectorstore: AsyncQdrantVectorStore
+    docstore: PostgresStore
+    retriever_factory: RetrieverFactory
+    rerank_score_cache: Optional[RerankScoreCache]
+    query_retriever: RetrieverLike
+    index_retriever: RetrieverLike
+    processor: LLMProcessor
+    answer_cache: Optional[SemanticAnswerCache]
+    pipeline: RAGPipeline
+    source_cache: Optional[LRUCache]
+    ingestion_queue: IngestionQueue
+
+
+async def corpus_version() -> int:
+    async with AsyncSessionFactory() as session:
+        return await get_corpus_version(session)
+
+
+def build_components(
+    qdrant_client: QdrantClient,
+    async_qdrant_client: AsyncQdrantClient,
+    mc: Any,
+    model_dense: Embeddings,
+    model_sparse: Any,
+    model_rerank: Any,
+    embedding_size: int,
+    processor: LLMProcessor,
+    docstore: Optional[PostgresStore] = None,
+    answer_cache_enabled: bool = ANSWER_CACHE_ENABLED,
+    version_provider: Callable[[], Awaitable[int]] = corpus_version,
+    retrieval_mode: RetrievalMode = RetrievalMode.HYBRID,
+) -> Components:
+    """
+    Wires the pipeline and its caches and queues around the given clients and
+    models, creating the Qdrant collection if needed.
+
+    Args:
+        qdrant_client: Sync client, used for indexing and collection setup.
+        async_qdrant_client: Async client for the request path.
+        mc: MinIO client (or a stand-in with the same interface).
+        model_dense, model_sparse, model_rerank: Embedding and reranking models.
+        embedding_size (int): Dimension of the dense embeddings.
+        processor (LLMProcessor): LLM used for rewriting and answering.
+        docstore (PostgresStore): Parent docstore, a PostgresStore on the
+            configured database by default.
+        answer_cache_enabled (bool): Whether to cache final answers.
+        version_provider: Returns the corpus version for the answer cache.
+        retrieval_mode (RetrievalMode): Qdrant retrieval mode.
+    """
+    create_collection(
+        client=qdrant_client,
+        collection_name=QDRANT_COLLECTION,
+        embedding_size=embedding_size
+    )
+    vectorstore = AsyncQdrantVectorStore(
+        client=qdrant_client,
+        async_client=async_qdrant_client,
+        collection_name=QDRANT_COLLECTION,
+        embedding=model_dense,
+        sparse_embedding=model_sparse,
+        retrieval_mode=retrieval_mode,
+        vector_name="dense",
+        sparse_vector_name="sparse"
+    )
+    if docstore is None:
+        docstore = PostgresStore(
+            sync_session_factory=SyncSessionFactory,
+            async_session_factory=AsyncSessionFactory
+        )
+
+    retriever_factory = RetrieverFactory(
+        vectorstore=vectorstore,
+        docstore=docstore
+    )
+    rerank_score_cache = RerankScoreCache(max_entries=RERANK_CACHE_SIZE) if RERANK_CACHE_SIZE > 0 else None
+    query_retriever = retriever_factory.create(
+        rerank=RERANK_ENABLED,
+        model_rerank=model_rerank,
+        cascade=RERANK_MODE == "cascade",
+        score_cache=rerank_score_cache
+    )
+    index_retriever = retriever_factory.create(rerank=False)
+
+    answer_cache = SemanticAnswerCache(
+        embeddings=model_dense,
+        version_provider=version_provider,
+        threshold=ANSWER_CACHE_THRESHOLD,
+        max_bytes=int(ANSWER_CACHE_MB * 1024 * 1024)
+    ) if answer_cache_enabled else None
+
+    loader = FileLoader()
+    pipeline = RAGPipeline(
+        loader=loader,
+        vectorstore=vectorstore,
+        docstore=docstore,
+        query_retriever=query_retriever,
+        index_retriever=index_retriever,
+        processor=processor,
+        answer_cache=answer_cache
+    )
+
+    source_cache = LRUCache(
+        name="source",
+        max_bytes=int(SOURCE_CACHE_MB * 1024 * 1024)
+    ) if SOURCE_CACHE_MB > 0 else None
+
+    ingestion_queue = IngestionQueue(
+        max_size=INGEST_QUEUE_SIZE,
+        concurrency=INGEST_CONCURRENCY
+    )
+
+    return Components(
+        qdrant_client=qdrant_client,
+        async_qdrant_client=async_qdrant_client,
+        mc=mc,
+        loader=loader,
+        vectorstore=vectorstore,
+        docstore=docstore,
+        retriever_factory=retriever_factory,
+        rerank_score_cache=rerank_score_cache,
+        query_retriever=query_retriever,
+        index_retriever=index_retriever,
+        processor=processor,
+        answer_cache=answer_cache,
+        pipeline=pipeline,
+        source_cache=source_cache,
+        ingestion_queue=ingestion_queue,
+    )
@@ -11,6 +11,8 @@ MINIO_ACCESS_KEY = os.environ.get("MINIO_ACCESS_KEY", "minioadmin")
 MINIO_SECRET_KEY = os.environ.get("MINIO_SECRET_KEY", "minioadmin")
 MINIO_SECURE = os.environ.get("MINIO_SECURE", "false").lower() == "true"
 MINIO_BUCKET = os.environ.get("MINIO_BUCKET", "default")
+MINIO_PART_SIZE = int(os.environ.get("MINIO_PART_SIZE", str(10 * 1024 * 1024)))
+MINIO_PARALLEL_PARTS = int(os.environ.get("MINIO_PARALLEL_PARTS", "4"))  # parts in flight per transfer
 
 # Qdrant
 QDRANT_URL = os.environ.get("QDRANT_URL", "http://localhost:6333")
@@ -24,13 +26,77 @@ LLM_API_KEY = os.environ.get("LLM_API_KEY", "")
 # Chainlit
 CHAINLIT_DB_URL = os.environ.get("CHAINLIT_DB_URL", "postgres:password@localhost:5432/chainlit")
 CHAINLIT_AUTH_SECRET = os.environ.get("CHAINLIT_AUTH_SECRET", "supersecret")
+# API server as reached from the browser (source panels are fetched from it)
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://localhost:8000").rstrip("/")
+CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "http://localhost:8888").split(",")
+# API server as reached from the Chainlit server (ingestion progress is polled from it)
+BACKEND_INTERNAL_URL = (os.environ.get("BACKEND_INTERNAL_URL") or BACKEND_URL).rstrip("/")
 
 # Postgres
 POSTGRES_URL = os.environ.get("POSTGRES_URL", "postgres:password@localhost:5432/store")
+DOCSTORE_WRITE_BATCH_SIZE = int(os.environ.get("DOCSTORE_WRITE_BATCH_SIZE", "1000"))  # rows per upsert statement
+
+# Uploads
+UPLOAD_SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR") or None  # None: system temp dir
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", "100"))
+INGEST_CONCURRENCY = int(os.environ.get("INGEST_CONCURRENCY", "2"))
+
+# Executors
+MODEL_EXECUTOR_WORKERS = int(os.environ.get("MODEL_EXECUTOR_WORKERS", "4"))
+LOADER_EXECUTOR_KIND = os.environ.get("LOADER_EXECUTOR_KIND", "thread")  # thread | process
+LOADER_EXECUTOR_WORKERS = int(os.environ.get("LOADER_EXECUTOR_WORKERS", "2"))
+STORAGE_EXECUTOR_WORKERS = int(os.environ.get("STORAGE_EXECUTOR_WORKERS", "8"))  # concurrent MinIO transfers
+# Intra-op threads of torch, set once at startup for the whole process (embedding models
+# and the torch reranker alike); 0: library default
+TORCH_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", "0"))
+
+# Query embedding micro-batching (EMBED_BATCH_WAIT_MS=0 disables batching)
+EMBED_BATCH_MAX_SIZE = int(os.environ.get("EMBED_BATCH_MAX_SIZE", "16"))
+EMBED_BATCH_WAIT_MS = float(os.environ.get("EMBED_BATCH_WAIT_MS", "2"))
+
+# Caches (size 0 disables)
+QUERY_EMBEDDING_CACHE_MB = float(os.environ.get("QUERY_EMBEDDING_CACHE_MB", "64"))
+RERANK_CACHE_SIZE = int(os.environ.get("RERANK_CACHE_SIZE", "50000"))  # (query, chunk) scores
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_MB = float(os.environ.get("ANSWER_CACHE_MB", "32"))
+SOURCE_CACHE_MB = float(os.environ.get("SOURCE_CACHE_MB", "16"))  # source panel contents
+
+# Reranking
+RERANK_ENABLED = os.environ.get("RERANK_ENABLED", "true").lower() == "true"
+RERANK_BACKEND = os.environ.get("RERANK_BACKEND", "torch")  # torch | onnx
+RERANK_QUANTIZE = os.environ.get("RERANK_QUANTIZE", "false").lower() == "true"
+RERANK_NUM_THREADS = int(os.environ.get("RERANK_NUM_THREADS", "0"))  # ONNX backend only; 0: library default
+RERANK_MODE = os.environ.get("RERANK_MODE", "full")  # full | cascade
+RERANK_ONNX_DIR = os.environ.get("RERANK_ONNX_DIR", os.path.expanduser("~/.cache/pro-rag/onnx"))
+
+# Retrieval: speculative retrieval starts retrieving the raw message while the query is
+# rewritten. When the rewrite differs, the speculative retrieval is abandoned, but its
+# embedding and reranking still run to completion on the executors, so such a request
+# costs two full retrievals
+SPECULATIVE_RETRIEVAL = os.environ.get("SPECULATIVE_RETRIEVAL", "false").lower() == "true"
+SPECULATIVE_SIMILARITY = float(os.environ.get("SPECULATIVE_SIMILARITY", "0.9"))
+
+# Streaming to the UI: tokens are sent in frames every STREAM_FLUSH_MS or STREAM_FLUSH_BYTES
+STREAM_FLUSH_MS = float(os.environ.get("STREAM_FLUSH_MS", "50"))
+STREAM_FLUSH_BYTES = int(os.environ.get("STREAM_FLUSH_BYTES", "512"))
+
+# Observability
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+REQUEST_ID_HEADER = os.environ.get("REQUEST_ID_HEADER", "X-Request-ID")
+# Per-request profiling (X-Profile: 1 header or ?profile=1, "/profile " chat prefix)
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+# An upload and the ingestion job it queues overlap briefly
+PROFILE_MAX_SESSIONS = int(os.environ.get("PROFILE_MAX_SESSIONS", "2"))
 
 # Other
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
 PORT = int(os.environ.get("PORT", "8000"))
+# Ingestion jobs, upload reservations and caches live in process memory, so the API
+# server must run as a single worker; startup fails if uvicorn/gunicorn are asked for more
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "1"))
 
 ### end .env
 
@@ -52,6 +118,14 @@ PARENT_CHUNK_OVERLAP = 100
 USE_PARENT_CHILD = True
 CHUNK_SIZE = 400
 CHUNK_OVERLAP = 50
+INDEX_BATCH_SIZE = 64
+SPARSE_BATCH_SIZE = 32
+RERANK_MAX_LENGTH = 512
+RERANK_BATCH_SIZE = 8
+CASCADE_MIN_K = 5
+CASCADE_SCORE_RATIO = 0.5
+CASCADE_BATCH_SIZE = 4
+CASCADE_MARGIN = 0.1
 
 BASE_MODEL="gpt-3.5-turbo-instruct"
 NUM_CTX=20480
@@ -0,0 +1,24 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.models import CorpusVersion
+
+
+async def get_corpus_version(session: AsyncSession) -> int:
+    result = await session.execute(
+        select(CorpusVersion.version).where(CorpusVersion.id == 1)
+    )
+    return result.scalar_one_or_none() or 0
+
+
+async def bump_corpus_version(session: AsyncSession) -> None:
+    """
+    Increments the corpus version within the caller's transaction.
+    """
+    stmt = insert(CorpusVersion).values(id=1, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CorpusVersion.id],
+        set_={"version": CorpusVersion.version + 1},
+    )
+    await session.execute(stmt)
@@ -1,7 +1,7 @@
 import uuid
 from typing import Optional
 from pydantic import BaseModel, Field
-from sqlalchemy import Column, Integer, String, Text, Boolean, TIMESTAMP, func, ForeignKey 
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Boolean, TIMESTAMP, func, ForeignKey, Computed, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.ext.declarative import declarative_base
@@ -22,10 +22,23 @@ class SQLDocument(Base):
     
     key = Column(String, primary_key=True)
     value = Column(JSONB)
+    # Generated from value, indexed for (source, order) lookups
+    source = Column(Text, Computed("value->'metadata'->>'source'", persisted=True))
+    ord = Column(Integer, Computed("((value->'metadata'->>'order'))::int", persisted=True))
+
+    __table_args__ = (
+        Index("docstore_source_ord_idx", "source", "ord"),
+    )
     
     def repr(self):
         return f"<SQLDocument(key='{self.key}', value='{self.value}')>" 
 
+class CorpusVersion(Base):
+    __tablename__ = "corpus_version"
+    
+    id = Column(Integer, primary_key=True, default=1)
+    version = Column(BigInteger, nullable=False, default=0)
+
 class DocumentModel(BaseModel):
     key: Optional[str] = Field(None)
     page_content: Optional[str] = Field(None)
@@ -1,11 +1,14 @@
 from typing import Dict, Optional, Generic, Iterator, Sequence, TypeVar, AsyncIterator
-from sqlalchemy import select, delete, cast, Integer
+from sqlalchemy import select, delete, or_, tuple_
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import insert
 from langchain_core.documents import Document
 from langchain_core.stores import BaseStore
 
 from src.logger import logger
+from src.metrics import instrumented
 from src.db.models import DocumentModel, SQLDocument
+from src.config import DOCSTORE_WRITE_BATCH_SIZE
 
 D = TypeVar("D", bound=Document)
 
@@ -16,108 +19,134 @@ class PostgresStore(BaseStore[str, DocumentModel], Generic[D]):
         sync_session_factory: sessionmaker,
         async_session_factory: sessionmaker,
         link_documents: bool = True,
+        key_field: str = "doc_id",
+        write_batch_size: int = DOCSTORE_WRITE_BATCH_SIZE,
     ):
         self.SyncSession = sync_session_factory
         self.AsyncSession = async_session_factory
         self.link_documents = link_documents
+        # metadata field stamped with the docstore key on fetch
+        self.key_field = key_field
+        self.write_batch_size = write_batch_size
 
     def serialize_document(self, doc: Document) -> dict:
-        return {"page_content": doc.page_content, "metadata": doc.metadata}
+        metadata = {k: v for k, v in doc.metadata.items() if k != self.key_field}
+        return {"page_content": doc.page_content, "metadata": metadata}
 
-    def deserialize_document(self, value: dict) -> Document:
+    def deserialize_document(self, value: dict, key: Optional[str] = None) -> Document:
+        metadata = value.get("metadata", {})
+        if key is not None:
+            metadata[self.key_field] = key
         return Document(
             page_content=value.get("page_content", ""),
-            metadata=value.get("metadata", {}),
+            metadata=metadata,
         )
 
-    def mget(self, keys: Sequence[str]) -> list[Document]:
+    def serialize_pairs(self, key_value_pairs: Sequence[tuple[str, Document]]) -> list[tuple[str, dict]]:
+        serialized_docs = []
+        for i, (key, document) in enumerate(key_value_pairs):
+            serialized_doc = self.serialize_document(document)
+            # store prev and next document keys in metadata, also store order
+            if self.link_documents:
+                prev_key = key_value_pairs[i - 1][0] if i > 0 else None
+                next_key = (
+                    key_value_pairs[i + 1][0]
+                    if i < len(key_value_pairs) - 1
+                    else None
+                )
+                metadata = serialized_doc.get("metadata", {})
+                metadata["prev_key"] = prev_key
+                metadata["next_key"] = next_key
+                metadata["order"] = i
+                serialized_doc["metadata"] = metadata
+            serialized_docs.append((key, serialized_doc))
+        return serialized_docs
+
+    @instrumented("chat", "docstore_get")
+    def mget(self, keys: Sequence[str]) -> list[Optional[Document]]:
         with self.SyncSession() as session:
             try:
-                sql_documents = (
-                    session.query(SQLDocument).filter(SQLDocument.key.in_(keys)).all()
+                result = session.execute(
+                    select(SQLDocument.key, SQLDocument.value).where(SQLDocument.key.in_(keys))
                 )
-                return [
-                    self.deserialize_document(sql_doc.value)
-                    for sql_doc in sql_documents
-                ]
+                documents = {
+                    key: self.deserialize_document(value, key=key) for key, value in result
+                }
+                return [documents.get(key) for key in keys]
             except Exception as e:
                 logger.error(f"Error in mget: {e}")
                 session.rollback()
-                return []
+                return [None] * len(keys)
 
-    async def amget(self, keys: Sequence[str]) -> list[Document]:
+    @instrumented("chat", "docstore_get")
+    async def amget(self, keys: Sequence[str]) -> list[Optional[Document]]:
         async with self.AsyncSession() as session:
             try:
-                stmt = select(SQLDocument).where(SQLDocument.key.in_(keys))
+                stmt = select(SQLDocument.key, SQLDocument.value).where(SQLDocument.key.in_(keys))
                 result = await session.execute(stmt)
-                sql_documents = result.scalars().all()
-                return [
-                    self.deserialize_document(sql_doc.value)
-                    for sql_doc in sql_documents
-                ]
+                documents = {
+                    key: self.deserialize_document(value, key=key) for key, value in result
+                }
+                return [documents.get(key) for key in keys]
             except Exception as e:
                 logger.error(f"Error in amget: {e}")
                 await session.rollback()
-                return []
+                return [None] * len(keys)
 
-    def mset(self, key_value_pairs: Sequence[tuple[str, Document]]) -> None:
+    def _upsert_statements(self, key_value_pairs: Sequence[tuple[str, Document]]):
+        """
+        Multi-row INSERT ... ON CONFLICT (key) DO UPDATE statements of at most
+        `write_batch_size` rows each, with the number of rows in each.
+        """
+        # A statement may not touch the same key twice; the last value wins
+        rows = [
+            {"key": key, "value": value}
+            for key, value in dict(self.serialize_pairs(key_value_pairs)).items()
+        ]
+        for i in range(0, len(rows), self.write_batch_size):
+            batch = rows[i:i + self.write_batch_size]
+            stmt = insert(SQLDocument).values(batch)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[SQLDocument.key],
+                set_={"value": stmt.excluded.value},
+            )
+            yield stmt, len(batch)
+
+    @instrumented("ingest", "docstore_write")
+    def mset(self, key_value_pairs: Sequence[tuple[str, Document]]) -> int:
+        """
+        Upserts the documents in one transaction. Returns the number of rows written.
+        """
+        written = 0
         with self.SyncSession() as session:
             try:
-                serialized_docs = []
-                for i, (key, document) in enumerate(key_value_pairs):
-                    serialized_doc = self.serialize_document(document)
-                    # store prev and next document keys in metadata, also store order
-                    if self.link_documents:
-                        prev_key = key_value_pairs[i - 1][0] if i > 0 else None
-                        next_key = (
-                            key_value_pairs[i + 1][0]
-                            if i < len(key_value_pairs) - 1
-                            else None
-                        )
-                        metadata = serialized_doc.get("metadata", {})
-                        metadata["prev_key"] = prev_key
-                        metadata["next_key"] = next_key
-                        metadata["order"] = i
-                        serialized_doc["metadata"] = metadata
-                    serialized_docs.append((key, serialized_doc))
-                documents_to_update = [
-                    SQLDocument(key=key, value=value) for key, value in serialized_docs
-                ]
-                session.bulk_save_objects(documents_to_update, update_changed_only=True)
+                for stmt, count in self._upsert_statements(key_value_pairs):
+                    session.execute(stmt)
+                    written += count
                 session.commit()
             except Exception as e:
                 logger.error(f"Error in mset: {e}")
                 session.rollback()
+                raise
+        return written
 
-    async def amset(self, key_value_pairs: Sequence[tuple[str, Document]]) -> None:
-        async with self.AsyncSession() as session:  # Session is async sessionmaker
+    @instrumented("ingest", "docstore_write")
+    async def amset(self, key_value_pairs: Sequence[tuple[str, Document]]) -> int:
+        """
+        Upserts the documents in one transaction. Returns the number of rows written.
+        """
+        written = 0
+        async with self.AsyncSession() as session:
             try:
-                serialized_docs = []
-                for i, (key, document) in enumerate(key_value_pairs):
-                    serialized_doc = self.serialize_document(document)
-                    # store prev and next document keys in metadata, also store order
-                    if self.link_documents:
-                        prev_key = key_value_pairs[i - 1][0] if i > 0 else None
-                        next_key = (
-                            key_value_pairs[i + 1][0]
-                            if i < len(key_value_pairs) - 1
-                            else None
-                        )
-                        metadata = serialized_doc.get("metadata", {})
-                        metadata["prev_key"] = prev_key
-                        metadata["next_key"] = next_key
-                        metadata["order"] = i
-                        serialized_doc["metadata"] = metadata
-                    serialized_docs.append((key, serialized_doc))
-                documents_to_update = [
-                  SQLDocument(key=key, value=value) for key, value in serialized_docs
-                ]
-                # Use async bulk operations or add_all + await flush
-                session.add_all(documents_to_update)
+                for stmt, count in self._upsert_statements(key_value_pairs):
+                    await session.execute(stmt)
+                    written += count
                 await session.commit()
             except Exception as e:
                 logger.error(f"Error in amset: {e}")
                 await session.rollback()
+                raise
+        return written
 
     def mdelete(self, keys: Sequence[str]) -> None:
         with self.SyncSession() as session:
@@ -165,18 +194,26 @@ class PostgresStore(BaseStore[str, DocumentModel], Generic[D]):
                 logger.error(f"Error in ayield_keys: {e}")
                 await session.rollback()
 
-    def get_key_by_value(self, value: Dict) -> Optional[str]:
-        source = value.get("metadata", {}).get("source", None)
-        order = value.get("metadata", {}).get("order", None)
+    @staticmethod
+    def _lookup_pair(metadata: Dict) -> Optional[tuple[str, int]]:
+        source = metadata.get("source", None)
+        order = metadata.get("order", None)
         if source is None or order is None:
             return None
+        return source, order
+
+    @instrumented("chat", "docstore_lookup")
+    def get_key_by_value(self, value: Dict) -> Optional[str]:
+        pair = self._lookup_pair(value.get("metadata", {}))
+        if pair is None:
+            return None
+        source, order = pair
         with self.SyncSession() as session:
             try:
                 result = session.execute(
                     select(SQLDocument.key).where(
-                        SQLDocument.value["metadata"]["source"].astext == source,
-                        cast(SQLDocument.value["metadata"]["order"].astext, Integer)
-                        == order,
+                        SQLDocument.source == source,
+                        SQLDocument.ord == order,
                     )
                 )
                 key = result.scalar_one_or_none()
@@ -186,19 +223,18 @@ class PostgresStore(BaseStore[str, DocumentModel], Generic[D]):
                 session.rollback()
                 return None
 
+    @instrumented("chat", "docstore_lookup")
     async def aget_key_by_value(self, value: Document) -> Optional[str]:
-        source = value.metadata.get("source", None)
-        order = value.metadata.get("order", None)
-        if source is None or order is None:
+        pair = self._lookup_pair(value.metadata)
+        if pair is None:
             return None
-
+        source, order = pair
         async with self.AsyncSession() as session:
             try:
                 result = await session.execute(
                     select(SQLDocument.key).where(
-                        SQLDocument.value["metadata"]["source"].astext == source,
-                        cast(SQLDocument.value["metadata"]["order"].astext, Integer)
-                        == order,
+                        SQLDocument.source == source,
+                        SQLDocument.ord == order,
                     )
                 )
                 key = result.scalar_one_or_none()
@@ -208,6 +244,107 @@ class PostgresStore(BaseStore[str, DocumentModel], Generic[D]):
                 await session.rollback()
                 return None
 
+    @instrumented("chat", "docstore_lookup")
+    def get_keys_by_values(self, values: Sequence[Dict]) -> list[Optional[str]]:
+        pairs = [self._lookup_pair(value.get("metadata", {})) for value in values]
+        lookup = {pair for pair in pairs if pair is not None}
+        if not lookup:
+            return [None] * len(values)
+        with self.SyncSession() as session:
+            try:
+                result = session.execute(
+                    select(SQLDocument.source, SQLDocument.ord, SQLDocument.key).where(
+                        tuple_(SQLDocument.source, SQLDocument.ord).in_(list(lookup))
+                    )
+                )
+                keys_by_pair = {(source, ord): key for source, ord, key in result}
+            except Exception as e:
+                logger.error(f"Error in get_keys_by_values: {e}")
+                session.rollback()
+                return [None] * len(values)
+        return [keys_by_pair.get(pair) for pair in pairs]
+
+    @instrumented("chat", "docstore_lookup")
+    async def aget_keys_by_values(self, values: Sequence[Document]) -> list[Optional[str]]:
+        """
+        Resolves the docstore keys of `values` with a single query.
+        Returns:
+            Keys aligned with `values` (None if not found).
+        """
+        pairs = [self._lookup_pair(value.metadata) for value in values]
+        lookup = {pair for pair in pairs if pair is not None}
+        if not lookup:
+            return [None] * len(values)
+        async with self.AsyncSession() as session:
+            try:
+                result = await session.execute(
+                    select(SQLDocument.source, SQLDocument.ord, SQLDocument.key).where(
+                        tuple_(SQLDocument.source, SQLDocument.ord).in_(list(lookup))
+                    )
+                )
+                keys_by_pair = {(source, ord): key for source, ord, key in result}
+            except Exception as e:
+                logger.error(f"Error in aget_keys_by_values: {e}")
+                await session.rollback()
+                return [None] * len(values)
+        return [keys_by_pair.get(pair) for pair in pairs]
+
+    @instrumented("chat", "docstore_lookup")
+    async def amget_neighbors(
+        self, documents: Sequence[Document]
+    ) -> tuple[list[Optional[str]], dict[str, Document]]:
+        """
+        Resolves the keys of `documents` and fetches their prev/next neighbors
+        in a single query.
+        Returns:
+            Keys aligned with `documents` (None if not found) and a mapping of
+            neighbor key -> Document.
+        """
+        # documents fetched through this store already carry their key
+        stamped = [doc.metadata.get(self.key_field) for doc in documents]
+        pairs = [
+            None if key else self._lookup_pair(doc.metadata)
+            for doc, key in zip(documents, stamped)
+        ]
+        lookup = {pair for pair in pairs if pair is not None}
+        neighbor_keys = {
+            doc.metadata.get(key_field)
+            for doc in documents
+            for key_field in ("prev_key", "next_key")
+            if doc.metadata.get(key_field)
+        }
+        if not lookup and not neighbor_keys:
+            return stamped, {}
+
+        conditions = []
+        if lookup:
+            conditions.append(tuple_(SQLDocument.source, SQLDocument.ord).in_(list(lookup)))
+        if neighbor_keys:
+            conditions.append(SQLDocument.key.in_(list(neighbor_keys)))
+
+        async with self.AsyncSession() as session:
+            try:
+                result = await session.execute(
+                    select(
+                        SQLDocument.source, SQLDocument.ord, SQLDocument.key, SQLDocument.value
+                    ).where(or_(*conditions))
+                )
+                rows = result.all()
+            except Exception as e:
+                logger.error(f"Error in amget_neighbors: {e}")
+                await session.rollback()
+                return stamped, {}
+
+        keys_by_pair = {}
+        neighbors = {}
+        for source, ord, key, value in rows:
+            keys_by_pair[(source, ord)] = key
+            if key in neighbor_keys:
+                neighbors[key] = self.deserialize_document(value, key=key)
+        keys = [
+            key or keys_by_pair.get(pair) for key, pair in zip(stamped, pairs)
+        ]
+        return keys, neighbors
 
 async def test():
 
@@ -0,0 +1,91 @@
+import asyncio
+import weakref
+import contextvars
+from functools import partial
+from typing import Any, Callable, Literal, Optional
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
+from src.config import (
+    MODEL_EXECUTOR_WORKERS,
+    LOADER_EXECUTOR_KIND,
+    LOADER_EXECUTOR_WORKERS,
+    STORAGE_EXECUTOR_WORKERS,
+)
+
+
+class BoundedExecutor:
+    """
+    Runs blocking callables in a thread or process pool so they do not stall
+    the event loop. At most `max_concurrency` calls are in flight per event
+    loop; further callers wait asynchronously for a slot.
+
+    Process pools require picklable callables and arguments, so they suit
+    parsing but not in-memory models.
+    """
+    def __init__(
+        self,
+        kind: Literal["thread", "process"] = "thread",
+        max_workers: int = 4,
+        max_concurrency: Optional[int] = None,
+        name: str = "executor",
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Invalid executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency or max_workers
+        self.name = name
+        self._executor: Optional[Executor] = None
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    @property
+    def executor(self) -> Executor:
+        # Created lazily so importing this module never spawns workers
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=self.name
+                )
+        return self._executor
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        async with self._semaphore():
+            loop = asyncio.get_running_loop()
+            call = partial(fn, *args, **kwargs)
+            if self.kind == "thread":
+                # Carry context variables (e.g. the log request id) into the worker
+                call = partial(contextvars.copy_context().run, call)
+            return await loop.run_in_executor(self.executor, call)
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+# Models live in memory, so they always run on threads
+model_executor = BoundedExecutor(
+    kind="thread",
+    max_workers=MODEL_EXECUTOR_WORKERS,
+    name="model",
+)
+loader_executor = BoundedExecutor(
+    kind=LOADER_EXECUTOR_KIND,
+    max_workers=LOADER_EXECUTOR_WORKERS,
+    name="loader",
+)
+# Blocking object storage transfers
+storage_executor = BoundedExecutor(
+    kind="thread",
+    max_workers=STORAGE_EXECUTOR_WORKERS,
+    name="storage",
+)
@@ -0,0 +1,166 @@
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Literal, Optional
+
+from src.logger import logger, request_id
+from src.metrics import registry, observe_stage
+from src.profiler import profiled
+
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+
+ingestion_jobs = registry.counter(
+    "ingestion_jobs_total",
+    "Finished ingestion jobs",
+    labelnames=("status",),
+)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+@dataclass
+class IngestionJob:
+    filename: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    request_id: str = field(default_factory=request_id.get)
+    profile: bool = False
+    status: JobStatus = "queued"
+    stages: dict[str, int] = field(
+        default_factory=lambda: {
+            "pages_parsed": 0,
+            "chunks_total": 0,
+            "chunks_embedded": 0,
+            "points_upserted": 0,
+            "parents_stored": 0,
+        }
+    )
+    result: dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def progress(self, stage: str, count: int) -> None:
+        self.stages[stage] = self.stages.get(stage, 0) + count
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "stages": dict(self.stages),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+JobHandler = Callable[[IngestionJob], Awaitable[Optional[dict]]]
+
+
+class IngestionQueue:
+    """
+    Bounded in-process queue of ingestion jobs, drained by a fixed pool of
+    asyncio workers. Job state is kept in memory, so the API server runs as a
+    single worker (see WEB_CONCURRENCY), and the most recent `max_finished`
+    finished jobs are retained for status queries.
+    """
+    def __init__(self, max_size: int, concurrency: int, max_finished: int = 1000):
+        self.max_size = max_size
+        self.concurrency = concurrency
+        self.max_finished = max_finished
+        self.jobs: OrderedDict[str, IngestionJob] = OrderedDict()
+        # Filenames claimed by uploads that are not submitted yet
+        self._reserved: set[str] = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"ingestion-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def full(self) -> bool:
+        return self._queue is None or self._queue.full()
+
+    def pending(self, filename: str) -> bool:
+        return filename in self._reserved or any(
+            job.filename == filename and not job.done for job in self.jobs.values()
+        )
+
+    def reserve(self, filename: str) -> bool:
+        """
+        Claims `filename` for an upload until its job is submitted, so that
+        concurrent uploads of the same name are rejected before any work is
+        done. Returns False if the name is already reserved or being ingested.
+        The reservation must be released with `release` once the job is
+        submitted or the upload fails.
+        """
+        if self.pending(filename):
+            return False
+        self._reserved.add(filename)
+        return True
+
+    def release(self, filename: str) -> None:
+        self._reserved.discard(filename)
+
+    def submit(self, filename: str, handler: JobHandler, profile: bool = False) -> IngestionJob:
+        if self._queue is None:
+            raise QueueFullError("Ingestion queue is not running")
+        job = IngestionJob(filename=filename, profile=profile)
+        try:
+            self._queue.put_nowait((job, handler))
+        except asyncio.QueueFull:
+            raise QueueFullError("Ingestion queue is full")
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    def _evict_finished(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[: max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job, handler = await self._queue.get()
+            request_id.set(job.request_id)
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                async with profiled(f"ingest {job.filename}", job.request_id, enabled=job.profile):
+                    job.result = await handler(job) or {}
+                job.status = "succeeded"
+            except Exception as e:
+                logger.error(f"Ingestion job {job.id} ({job.filename}) failed: {e}")
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                ingestion_jobs.labels(status=job.status).inc()
+                observe_stage("ingest", "queue_wait", job.started_at - job.created_at)
+                observe_stage("ingest", "job", job.finished_at - job.started_at)
+                self._queue.task_done()
+                self._evict_finished()
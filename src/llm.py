@@ -1,9 +1,12 @@
 import ast
+import time
+from contextlib import aclosing
 from langchain_core.prompts import PromptTemplate
 from langchain_openai import OpenAI
 
 from src.prompts import prompt_final_answer, prompt_query_rewrite, prompt_context_relevance
 from src.utils import extract_json_str
+from src.metrics import instrumented, observe_stage
 from src.config import STOP_TOKENS, LLM_API_KEY, LLM_BASE_URL, BASE_MODEL, NUM_CTX, NUM_PREDICT
 
 class LLMProcessor:
@@ -24,6 +27,7 @@ class LLMProcessor:
             verbose=False,
         )
 
+    @instrumented("chat", "build_context")
     def build_context(self, sources: list[dict]) -> str:
         context = ""
         for source in sources:
@@ -33,6 +37,7 @@ class LLMProcessor:
             context += f"Source: {name}, Page: {page}\n```{content}```\n\n"
         return context
 
+    @instrumented("chat", "query_rewrite")
     async def query_rewrite(
         self,
         message: str,
@@ -78,12 +83,22 @@ class LLMProcessor:
     ):
         prompt = prompt_template.format(context=context, message=message)
         stop = False
-        async for chunk in self.llm.astream(prompt):
-            for token in STOP_TOKENS:
-                if token in chunk:
-                    stop = True
-                    break
-            if stop:
-                break
-            yield chunk
+        start = time.perf_counter()
+        first_token = True
+        try:
+            # Closing the stream on early exit aborts the upstream completion
+            async with aclosing(self.llm.astream(prompt)) as stream:
+                async for chunk in stream:
+                    if first_token:
+                        observe_stage("chat", "llm_ttft", time.perf_counter() - start)
+                        first_token = False
+                    for token in STOP_TOKENS:
+                        if token in chunk:
+                            stop = True
+                            break
+                    if stop:
+                        break
+                    yield chunk
+        finally:
+            observe_stage("chat", "llm_stream", time.perf_counter() - start)
 
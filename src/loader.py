@@ -2,6 +2,9 @@ from typing import Literal
 from langchain_core.documents import Document
 from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
 
+from src.executor import loader_executor
+from src.metrics import instrumented
+
 class FileLoader:
     page_delimiter = "\n<<<END_OF_PAGE>>>\n\f"
     page_annotation_template = "<<<START_OF_PAGE: {page_num}>>>\n{content}"
@@ -19,6 +22,11 @@ class FileLoader:
         else:
             raise ValueError("Unsupported file extension.")
 
+    @instrumented("ingest", "parse")
+    async def aload(self, file_path: str, mode: Literal["single", "page"]) -> list[Document]:
+        # Parsing (and OCR with extract_images=True) is CPU-bound
+        return await loader_executor.run(self.load, file_path, mode)
+
     def _load_pdf(
         self,
         file_path: str,
@@ -1,6 +1,15 @@
 import logging
+from contextvars import ContextVar
 from src.config import LOG_LEVEL
 
+# Correlates log lines of one request; set by the API middleware and the chat handler
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
 # Map config string to logging level
 log_levels = {
     "DEBUG": logging.DEBUG,
@@ -19,10 +28,11 @@ logger.setLevel(log_level)
 # Create handler
 stream_handler = logging.StreamHandler()
 stream_handler.setLevel(log_level)
+stream_handler.addFilter(RequestIdFilter())
 
 # Create formatter
 formatter = logging.Formatter(
-    "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - %(message)s"
 )
 stream_handler.setFormatter(formatter)
 
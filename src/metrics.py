@@ -0,0 +1,298 @@
+import time
+import bisect
+import inspect
+import functools
+import threading
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Optional
+
+from src.config import METRICS_ENABLED
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs: list[tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    """
+    Base for metrics with optional labels: a metric declared with
+    `labelnames` is a family whose children are created by `labels()`.
+    """
+    type = ""
+
+    def __init__(self, name: str, description: str = "", labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> "_Metric":
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _series(self) -> list[tuple[list[tuple[str, str]], "_Metric"]]:
+        if not self.labelnames:
+            return [([], self)]
+        with self._lock:
+            children = list(self._children.items())
+        return [(list(zip(self.labelnames, key)), child) for key, child in children]
+
+    def snapshot(self) -> dict:
+        return {
+            ",".join(f"{name}={value}" for name, value in labels): child.snapshot()
+            for labels, child in self._series()
+        }
+
+    def _expose_series(self, labels: list[tuple[str, str]]) -> list[str]:
+        raise NotImplementedError
+
+    def expose(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for labels, child in self._series():
+            lines.extend(child._expose_series(labels))
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, description: str = "", labelnames: tuple[str, ...] = ()):
+        super().__init__(name, description, labelnames)
+        self._value = 0.0
+
+    def _new_child(self) -> "Counter":
+        return Counter(self.name, self.description)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> dict:
+        if self.labelnames:
+            return super().snapshot()
+        return {"value": self._value}
+
+    def _expose_series(self, labels: list[tuple[str, str]]) -> list[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(self._value)}"]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        labelnames: tuple[str, ...] = (),
+    ):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.description, self.buckets)
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self) -> "Timer":
+        return Timer(self)
+
+    def snapshot(self) -> dict:
+        if self.labelnames:
+            return super().snapshot()
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            cumulative[bound] = running
+        return {"count": count, "sum": total, "buckets": cumulative}
+
+    def _expose_series(self, labels: list[tuple[str, str]]) -> list[str]:
+        snapshot = self.snapshot()
+        lines = [
+            f"{self.name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}"
+            for bound, cumulative in snapshot["buckets"].items()
+        ]
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(snapshot['sum'])}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {snapshot['count']}")
+        return lines
+
+
+class Timer:
+    """
+    Context manager observing the elapsed wall time in a histogram.
+    """
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: dict[str, Counter | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def counter(
+        self,
+        name: str,
+        description: str = "",
+        labelnames: tuple[str, ...] = (),
+    ) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, description, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        description: str = "",
+        buckets: Optional[tuple[float, ...]] = None,
+        labelnames: tuple[str, ...] = (),
+    ) -> Histogram:
+        return self._get_or_create(
+            name, lambda: Histogram(name, description, buckets or DEFAULT_BUCKETS, labelnames)
+        )
+
+    def _get_or_create(self, name, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {name: metric.snapshot() for name, metric in metrics.items()}
+
+    def exposition(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        for _, metric in metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(enabled=METRICS_ENABLED)
+
+stage_seconds = registry.histogram(
+    "rag_stage_duration_seconds",
+    "Time spent per pipeline stage",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+    labelnames=("pipeline", "stage"),
+)
+
+# Per-request list of (pipeline, stage, seconds), set while a request is profiled
+stage_log: ContextVar[Optional[list]] = ContextVar("stage_log", default=None)
+
+_disabled = nullcontext()
+
+
+class StageTimer:
+    __slots__ = ("pipeline", "stage", "log", "start")
+
+    def __init__(self, pipeline: str, stage: str, log: Optional[list]):
+        self.pipeline = pipeline
+        self.stage = stage
+        self.log = log
+
+    def __enter__(self) -> "StageTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _record(self.pipeline, self.stage, time.perf_counter() - self.start, self.log)
+
+
+def _record(pipeline: str, stage: str, seconds: float, log: Optional[list]) -> None:
+    if registry.enabled:
+        stage_seconds.labels(pipeline=pipeline, stage=stage).observe(seconds)
+    if log is not None:
+        log.append((pipeline, stage, seconds))
+
+
+def timed(pipeline: str, stage: str):
+    """
+    Times a block into rag_stage_duration_seconds{pipeline, stage} and, for
+    profiled requests, the request's stage log. A shared no-op context
+    manager when neither is active.
+    """
+    log = stage_log.get()
+    if not registry.enabled and log is None:
+        return _disabled
+    return StageTimer(pipeline, stage, log)
+
+
+def observe_stage(pipeline: str, stage: str, seconds: float) -> None:
+    _record(pipeline, stage, seconds, stage_log.get())
+
+
+def instrumented(pipeline: str, stage: str):
+    """
+    Decorator timing every call of a function or coroutine function with `timed`.
+    """
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with timed(pipeline, stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(pipeline, stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
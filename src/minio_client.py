@@ -1,41 +1,151 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from minio import Minio
+from minio.error import S3Error
 from typing import BinaryIO
 
+from src.executor import storage_executor
+from src.config import MINIO_PART_SIZE, MINIO_PARALLEL_PARTS
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
 class MinioClient:
-    def __init__(self, endpoint: str, access_key: str, secret_key: str, secure: bool = False):
+    """
+    MinIO client whose transfers use multipart uploads and ranged downloads
+    of `part_size` parts, `parallel_parts` at a time. The a* methods run the
+    blocking transfers on the storage executor, off the event loop.
+    """
+    def __init__(
+        self,
+        endpoint: str,
+        access_key: str,
+        secret_key: str,
+        secure: bool = False,
+        part_size: int = MINIO_PART_SIZE,
+        parallel_parts: int = MINIO_PARALLEL_PARTS,
+    ):
         self.client = Minio(endpoint, access_key=access_key, secret_key=secret_key, secure=secure)
+        self.part_size = part_size
+        self.parallel_parts = parallel_parts
+        # Buckets known to exist; they are never deleted by this app
+        self._buckets: set[str] = set()
+        self._buckets_lock = threading.Lock()
+
+    def ensure_bucket(self, bucket_name: str) -> None:
+        if bucket_name in self._buckets:
+            return
+        with self._buckets_lock:
+            if bucket_name in self._buckets:
+                return
+            if not self.client.bucket_exists(bucket_name):
+                try:
+                    self.client.make_bucket(bucket_name)
+                except S3Error as e:
+                    # Created concurrently by another process
+                    if e.code not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
+                        raise
+            self._buckets.add(bucket_name)
 
     def upload_file(
-            self, 
-            bucket_name: str, 
-            object_name: str, 
-            data: BinaryIO, 
+            self,
+            bucket_name: str,
+            object_name: str,
+            data: BinaryIO,
             content_type: str = "application/octet-stream"
         ):
-        if not self.client.bucket_exists(bucket_name):
-            self.client.make_bucket(bucket_name)
-
-        data.seek(0, 2)
-        size = data.tell()
         data.seek(0)
+        self.upload_stream(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            data=data,
+            content_type=content_type
+        )
+
+    def upload_stream(
+            self,
+            bucket_name: str,
+            object_name: str,
+            data: BinaryIO,
+            content_type: str = "application/octet-stream",
+            part_size: int | None = None
+        ):
+        """
+        Upload a stream of unknown length as a multipart upload, reading it
+        exactly once (no seeking to compute the size). Parts are uploaded in
+        parallel while the next ones are read, so at most about
+        `parallel_parts + 1` parts are held in memory.
+        """
+        self.ensure_bucket(bucket_name)
 
         self.client.put_object(
-            bucket_name=bucket_name, 
-            object_name=object_name, 
-            data=data, 
-            length=size,
+            bucket_name=bucket_name,
+            object_name=object_name,
+            data=data,
+            length=-1,
+            part_size=part_size or self.part_size,
+            num_parallel_uploads=self.parallel_parts,
             content_type=content_type
         )
 
+    def _download_range(self, bucket_name: str, object_name: str, file_path: str, offset: int, length: int):
+        response = self.client.get_object(bucket_name, object_name, offset=offset, length=length)
+        try:
+            with open(file_path, "r+b") as f:
+                f.seek(offset)
+                for chunk in response.stream(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        finally:
+            response.close()
+            response.release_conn()
+
     def download_file(
-            self, 
-            bucket_name: str, 
+            self,
+            bucket_name: str,
             object_name: str,
             file_path: str
         ):
-        if file_path:
+        """
+        Download an object to `file_path`. Objects larger than one part are
+        fetched as parallel ranged GETs into a temporary file that replaces
+        `file_path` once complete.
+        """
+        if not file_path:
+            return
+        size = self.client.stat_object(bucket_name, object_name).size
+        if size <= self.part_size or self.parallel_parts <= 1:
             self.client.fget_object(
-                bucket_name=bucket_name, 
+                bucket_name=bucket_name,
                 object_name=object_name,
                 file_path=file_path
             )
+            return
+
+        tmp_path = f"{file_path}.part"
+        with open(tmp_path, "wb") as f:
+            f.truncate(size)
+        try:
+            with ThreadPoolExecutor(max_workers=self.parallel_parts, thread_name_prefix="minio") as pool:
+                futures = [
+                    pool.submit(
+                        self._download_range, bucket_name, object_name, tmp_path,
+                        offset, min(self.part_size, size - offset)
+                    )
+                    for offset in range(0, size, self.part_size)
+                ]
+                for future in futures:
+                    future.result()
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    async def aupload_file(self, *args, **kwargs):
+        return await storage_executor.run(self.upload_file, *args, **kwargs)
+
+    async def aupload_stream(self, *args, **kwargs):
+        return await storage_executor.run(self.upload_stream, *args, **kwargs)
+
+    async def adownload_file(self, *args, **kwargs):
+        return await storage_executor.run(self.download_file, *args, **kwargs)
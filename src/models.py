@@ -1,12 +1,131 @@
+from typing import Any, ClassVar, Optional
+import torch
+from pydantic import PrivateAttr
 from sentence_transformers import SparseEncoder
 from langchain_qdrant.sparse_embeddings import SparseVector
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_qdrant import FastEmbedSparse
-from langchain_community.cross_encoders import HuggingFaceCrossEncoder
 
-from src.config import DENSE_MODEL, SPARSE_MODEL, RERANKING_MODEL
+from src.executor import model_executor
+from src.metrics import timed
+from src.sparse import coo_to_sparse_vectors
+from src.batcher import EmbeddingBatcher
+from src.cache import LRUCache, normalize_query
+from src.reranker import FastCrossEncoder
+from src.config import (
+    DENSE_MODEL,
+    SPARSE_MODEL,
+    RERANKING_MODEL,
+    EMBED_BATCH_MAX_SIZE,
+    EMBED_BATCH_WAIT_MS,
+    QUERY_EMBEDDING_CACHE_MB,
+    SPARSE_BATCH_SIZE,
+    RERANK_BACKEND,
+    RERANK_QUANTIZE,
+    TORCH_NUM_THREADS,
+)
 
-class SparseEncoderWrapper:
+# Process-wide, so set before any model is loaded
+if TORCH_NUM_THREADS > 0:
+    torch.set_num_threads(TORCH_NUM_THREADS)
+
+# Shared by all models, keyed on (model name, normalized query)
+query_embedding_cache = (
+    LRUCache("query_embedding", max_bytes=int(QUERY_EMBEDDING_CACHE_MB * 1024 * 1024))
+    if QUERY_EMBEDDING_CACHE_MB > 0
+    else None
+)
+
+class ExecutorEmbeddingsMixin:
+    """
+    Shared query/async behaviour for the embedding models:
+        - embed_query is served from the query embedding cache when possible,
+          otherwise goes through an optional micro-batcher, falling back to
+          embed_queries([text]) when batching is disabled
+        - aembed_query / aembed_documents run on the bounded model executor,
+          so async callers never run model inference on the event loop
+    Subclasses implement embed_queries(list[str]) as a batched query encoder.
+    Query and document embedding time is recorded under `metrics_stage`.
+    """
+    metrics_stage = "embed"
+
+    def enable_query_batching(self, name: str, max_batch_size: int, max_wait_ms: float) -> None:
+        self._query_batcher = EmbeddingBatcher(
+            self.embed_queries,
+            name=name,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+        )
+
+    def _cache_key(self, text: str) -> tuple[str, str]:
+        return getattr(self, "model_name", type(self).__name__), normalize_query(text)
+
+    def _embed_query_uncached(self, text: str):
+        batcher = getattr(self, "_query_batcher", None)
+        if batcher is not None:
+            return batcher.embed(text)
+        return self.embed_queries([text])[0]
+
+    def embed_query(self, text: str):
+        with timed("chat", self.metrics_stage):
+            if query_embedding_cache is None:
+                return self._embed_query_uncached(text)
+            key = self._cache_key(text)
+            vector = query_embedding_cache.get(key)
+            if vector is None:
+                vector = self._embed_query_uncached(text)
+                query_embedding_cache.put(key, vector)
+            return vector
+
+    async def aembed_query(self, text: str):
+        with timed("chat", self.metrics_stage):
+            return await self._aembed_query(text)
+
+    async def _aembed_query(self, text: str):
+        if query_embedding_cache is not None:
+            vector = query_embedding_cache.get(self._cache_key(text))
+            if vector is not None:
+                return vector
+        batcher = getattr(self, "_query_batcher", None)
+        if batcher is not None:
+            vector = await batcher.aembed(text)
+        else:
+            vector = await model_executor.run(self.embed_queries, [text])
+            vector = vector[0]
+        if query_embedding_cache is not None:
+            query_embedding_cache.put(self._cache_key(text), vector)
+        return vector
+
+    def embed_documents(self, texts: list[str]):
+        with timed("ingest", self.metrics_stage):
+            return super().embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]):
+        return await model_executor.run(self.embed_documents, texts)
+
+class DenseEmbeddings(ExecutorEmbeddingsMixin, HuggingFaceEmbeddings):
+    metrics_stage: ClassVar[str] = "embed_dense"
+    _query_batcher: Optional[Any] = PrivateAttr(default=None)
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        # Same encode kwargs as HuggingFaceEmbeddings.embed_query
+        embed_kwargs = self.query_encode_kwargs or self.encode_kwargs
+        return self._embed(texts, embed_kwargs)
+
+class SparseEmbeddings(ExecutorEmbeddingsMixin, FastEmbedSparse):
+    metrics_stage = "embed_sparse"
+
+    def __init__(self, model_name: str = SPARSE_MODEL, **kwargs):
+        super().__init__(model_name=model_name, **kwargs)
+        self.model_name = model_name
+
+    def embed_queries(self, texts: list[str]) -> list[SparseVector]:
+        return [
+            SparseVector(indices=result.indices.tolist(), values=result.values.tolist())
+            for result in self._model.query_embed(texts)
+        ]
+
+class SparseEncoderWrapper(ExecutorEmbeddingsMixin):
     """
     A wrapper around sentence-transformers' SparseEncoder that standardizes the interface
     to match FastEmbedSparse, making it compatible with Qdrant and LangChain's expected
@@ -14,46 +133,48 @@ class SparseEncoderWrapper:
 
     This wrapper provides:
         - embed_query(str) -> SparseVector
+        - embed_queries(list[str]) -> list[SparseVector]
         - embed_documents(list[str]) -> list[SparseVector]
+        - aembed_query / aembed_documents, run on the model executor
     
     Outputs are converted into SparseVector format with explicit indices and values,
     ensuring consistency with other sparse retrievers like FastEmbedSparse.
     """
-    def __init__(self, model_name: str):
+    metrics_stage = "embed_sparse"
+
+    def __init__(self, model_name: str, batch_size: int = SPARSE_BATCH_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
         self.model = SparseEncoder(model_name)
     
-    def embed_query(self, query: str):
-        result = self.model.encode_query(query).coalesce()
-        return SparseVector(
-            indices=result.indices()[0].tolist(),
-            values=result.values().tolist()
-        )
-    
-    def embed_documents(self, docs: list[str]):
-        batched = self.model.encode_documents(docs)
-        row_indices = batched.indices()[0]
-        col_indices = batched.indices()[1]
-        values = batched.values()
+    def _to_sparse_vectors(self, batched) -> list[SparseVector]:
+        # Raw COO entries: coo_to_sparse_vectors sorts and sums repeats itself
+        rows, cols = batched._indices().cpu().numpy()
+        values = batched._values().detach().float().cpu().numpy()
+        return coo_to_sparse_vectors(rows, cols, values, n_rows=batched.size(0))
 
-        num = batched.size(0)
-        vectors = [[] for _ in range(num)]
+    def _encode(self, encode, texts: list[str]) -> list[SparseVector]:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i:i + self.batch_size]
+            vectors.extend(self._to_sparse_vectors(encode(batch, batch_size=self.batch_size)))
+        return vectors
 
-        for id, token_id, value in zip(row_indices, col_indices, values):
-            vectors[id.item()].append((token_id.item(), value.item()))
-        
-        return [
-            SparseVector(
-                indices=[idx for idx, _ in vector],
-                values=[val for _, val in vector]
-            )
-            for vector in vectors
-        ]
+    def embed_queries(self, queries: list[str]) -> list[SparseVector]:
+        return self._encode(self.model.encode_query, queries)
+    
+    def embed_documents(self, docs: list[str]):
+        with timed("ingest", self.metrics_stage):
+            return self._encode(self.model.encode_documents, docs)
 
 # model_sparse = SparseEncoderWrapper(model_name=SPARSE_MODEL)
-model_sparse = FastEmbedSparse(model_name=SPARSE_MODEL)
-model_dense = HuggingFaceEmbeddings(model_name=DENSE_MODEL)
-model_rerank = HuggingFaceCrossEncoder(model_name=RERANKING_MODEL, model_kwargs={"trust_remote_code": True})
-
-# Fix for "ValueError: Cannot handle batch_size > 1 if no padding token is defined"
-if not model_rerank.client.model.config.pad_token_id:
-    model_rerank.client.model.config.pad_token_id = model_rerank.client.tokenizer.pad_token_id
+model_sparse = SparseEmbeddings(model_name=SPARSE_MODEL)
+model_dense = DenseEmbeddings(model_name=DENSE_MODEL)
+if EMBED_BATCH_WAIT_MS > 0:
+    model_dense.enable_query_batching("dense", EMBED_BATCH_MAX_SIZE, EMBED_BATCH_WAIT_MS)
+    model_sparse.enable_query_batching("sparse", EMBED_BATCH_MAX_SIZE, EMBED_BATCH_WAIT_MS)
+model_rerank = FastCrossEncoder(
+    model_name=RERANKING_MODEL,
+    backend=RERANK_BACKEND,
+    quantize=RERANK_QUANTIZE
+)
@@ -0,0 +1,227 @@
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from src.logger import logger
+from src.metrics import stage_log
+from src.config import PROFILING_ENABLED, PROFILE_DIR, PROFILE_INTERVAL_MS, PROFILE_MAX_SESSIONS
+
+# Leaf frames of threads parked waiting for work
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+# Bounds sampling overhead; requests beyond the limit run unprofiled
+_active = threading.BoundedSemaphore(PROFILE_MAX_SESSIONS)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_FLAGS = {"1", "true", "yes"}
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler: a background thread snapshots the stacks of
+    all other threads every `interval` seconds via sys._current_frames().
+    Samples are process-wide, so concurrent requests show up as well.
+    """
+    def __init__(self, interval: float, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.frames: list[dict] = []
+        self._frame_index: dict[tuple, int] = {}
+        self.samples: dict[int, list[list[int]]] = defaultdict(list)
+        self.weights: dict[int, list[float]] = defaultdict(list)
+        self.thread_names: dict[int, str] = {}
+        self.start_time = self.end_time = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self.start_time = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.end_time = time.perf_counter()
+
+    def _index(self, code) -> int:
+        key = (code.co_filename, code.co_name, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+        return index
+
+    def _is_idle(self, frame) -> bool:
+        code = frame.f_code
+        return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (not self.include_idle and self._is_idle(frame)):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._index(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples[ident].append(stack)
+                self.weights[ident].append(elapsed)
+        self.thread_names = {t.ident: t.name for t in threading.enumerate()}
+
+    def speedscope(self, name: str) -> dict:
+        """
+        The samples in speedscope's file format, one profile per thread.
+        """
+        profiles = []
+        for ident in sorted(self.samples, key=lambda i: len(self.samples[i]), reverse=True):
+            profiles.append({
+                "type": "sampled",
+                "name": self.thread_names.get(ident, str(ident)),
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.end_time - self.start_time,
+                "samples": self.samples[ident],
+                "weights": self.weights[ident],
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "activeProfileIndex": 0,
+            "exporter": "pro-rag",
+            "shared": {"frames": self.frames},
+            "profiles": profiles,
+        }
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", value).strip("_")[:60]
+
+
+class ProfileSession:
+    """
+    Profiles one request: samples stacks and collects the request's stage
+    timings, then writes `<directory>/<time>-<request id>-<label>.speedscope.json`.
+    """
+    def __init__(
+        self,
+        label: str,
+        request_id: str,
+        directory: str = PROFILE_DIR,
+        interval_ms: float = PROFILE_INTERVAL_MS,
+    ):
+        self.label = label
+        self.request_id = request_id
+        self.stages: list[tuple[str, str, float]] = []
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{_slug(request_id)}-{_slug(label)}.speedscope.json"
+        self.path = os.path.join(directory, filename)
+        self.profiler = SamplingProfiler(interval=interval_ms / 1000)
+        self.stopped = False
+
+    def start(self) -> "ProfileSession":
+        # Stage timings of this request (and the executor work it spawns) land in self.stages
+        self._token = stage_log.set(self.stages)
+        self.profiler.start()
+        return self
+
+    def stop(self) -> Optional[str]:
+        if self.stopped:
+            return None
+        self.stopped = True
+        try:
+            self.profiler.stop()
+            profile = self.profiler.speedscope(f"{self.label} [{self.request_id}]")
+            totals = defaultdict(float)
+            for pipeline, stage, seconds in self.stages:
+                totals[f"{pipeline}.{stage}"] += seconds
+            # Extra keys are ignored by speedscope
+            profile["metadata"] = {
+                "request_id": self.request_id,
+                "label": self.label,
+                "duration_s": self.profiler.end_time - self.profiler.start_time,
+                "stage_totals_s": dict(totals),
+                "stages": [
+                    {"pipeline": pipeline, "stage": stage, "seconds": seconds}
+                    for pipeline, stage, seconds in self.stages
+                ],
+            }
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "w") as f:
+                json.dump(profile, f)
+            logger.info(f"Wrote profile {self.path}")
+            return self.path
+        except Exception as e:
+            logger.error(f"Failed to write profile {self.path}: {e}")
+            return None
+        finally:
+            _active.release()
+
+    async def astop(self) -> Optional[str]:
+        # Joining the sampler and writing a large profile would stall the event loop
+        return await asyncio.to_thread(self.stop)
+
+
+def profile_requested(request) -> bool:
+    """
+    Whether an HTTP request asks to be profiled, via `X-Profile: 1` or `?profile=1`.
+    """
+    if not PROFILING_ENABLED:
+        return False
+    flag = request.headers.get(PROFILE_HEADER) or request.query_params.get("profile") or ""
+    return flag.lower() in PROFILE_FLAGS
+
+
+def start_profile(label: str, request_id: str) -> Optional[ProfileSession]:
+    """
+    Starts profiling the current request. Returns None when profiling is
+    disabled or PROFILE_MAX_SESSIONS requests are already being profiled.
+    """
+    if not PROFILING_ENABLED:
+        return None
+    if not _active.acquire(blocking=False):
+        logger.warning(f"Profiler busy, not profiling {label}")
+        return None
+    try:
+        return ProfileSession(label, request_id).start()
+    except Exception:
+        _active.release()
+        raise
+
+
+@asynccontextmanager
+async def profiled(label: str, request_id: str, enabled: bool = True) -> AsyncIterator[Optional[ProfileSession]]:
+    session = start_profile(label, request_id) if enabled else None
+    try:
+        yield session
+    finally:
+        if session:
+            await session.astop()
+            # Long-lived tasks (e.g. ingestion workers) must not keep logging stages
+            stage_log.reset(session._token)
+
+
+async def stop_after(body: AsyncIterator, session: ProfileSession) -> AsyncIterator:
+    """
+    Wraps a streaming response body so profiling ends when the body does.
+    """
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        await session.astop()
@@ -1,6 +1,10 @@
-from typing import Literal
+import uuid
+import asyncio
+from typing import Any, Iterable, Literal, Optional, Sequence
 import numpy as np
-from qdrant_client import QdrantClient
+from langchain_core.documents import Document
+from langchain_qdrant import QdrantVectorStore, RetrievalMode
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.http.models import (
     Distance,
     Modifier,
@@ -14,15 +18,63 @@ from qdrant_client.http.models import (
     Fusion,
     FusionQuery,
     Prefetch,
+    PointStruct,
     SparseVector,
 )
 
+from src.metrics import timed
+
+class InstrumentedQdrantClient(QdrantClient):
+    """
+    QdrantClient timing queries and upserts into the stage metrics.
+    """
+    def query_points(self, *args, **kwargs):
+        with timed("chat", "qdrant_query"):
+            return super().query_points(*args, **kwargs)
+
+    def upsert(self, *args, **kwargs):
+        with timed("ingest", "qdrant_upsert"):
+            return super().upsert(*args, **kwargs)
+
+
+class InstrumentedAsyncQdrantClient(AsyncQdrantClient):
+    """
+    AsyncQdrantClient timing queries and upserts into the stage metrics.
+    """
+    async def query_points(self, *args, **kwargs):
+        with timed("chat", "qdrant_query"):
+            return await super().query_points(*args, **kwargs)
+
+    async def upsert(self, *args, **kwargs):
+        with timed("ingest", "qdrant_upsert"):
+            return await super().upsert(*args, **kwargs)
+
+
 def normalize(vec):
     vec = np.array(vec)
     norm = np.linalg.norm(vec)
     return vec / norm if norm != 0 else vec
 
 
+def _collection_config(
+    embedding_size: int,
+    distance: Distance,
+    sparse_modifier: Modifier,
+) -> dict:
+    return {
+        "vectors_config": {
+            "dense": VectorParams(
+                size=embedding_size,
+                distance=distance,
+            )
+        },
+        "sparse_vectors_config": {
+            "sparse": SparseVectorParams(
+                modifier=sparse_modifier
+            )
+        },
+    }
+
 def create_collection(
     client: QdrantClient,
     collection_name: str,
@@ -40,90 +92,76 @@ def create_collection(
 
     client.create_collection(
         collection_name=collection_name,
-        vectors_config={
-            "dense": VectorParams(
-                size=embedding_size,
-                distance=distance,
-            )
-        },
-        sparse_vectors_config={
-            "sparse": SparseVectorParams(
-                modifier=sparse_modifier
-            )
-        },
+        **_collection_config(embedding_size, distance, sparse_modifier),
     )
     return True
 
-def search_collection(
-    client: QdrantClient,
+async def acreate_collection(
+    client: AsyncQdrantClient,
     collection_name: str,
-    query: str,   
-    model_dense = None,
-    model_sparse = None,
-    mode: Literal["sparse", "dense", "hybrid"] = "hybrid",
-    filenames: str | list[str] = None,
-    k: int = 5
-) -> list[dict]:
-    
-    if not filenames:
-        query_filter = None
-    else:
-        if isinstance(filenames, str):
-            match = MatchValue(value=filenames)
-        elif isinstance(filenames, list):
-            match = MatchAny(any=filenames)
+    embedding_size: int,
+    distance: Distance = Distance.COSINE,
+    sparse_modifier: Modifier = Modifier.IDF,
+) -> bool:
+    """
+    Async version of `create_collection`.
+    """
+    if await client.collection_exists(collection_name):
+        return False
 
-        query_filter = Filter(
-            must=[
-                FieldCondition(
-                    key="metadata.source",
-                    match=match
-                )
-            ]
-        )
+    await client.create_collection(
+        collection_name=collection_name,
+        **_collection_config(embedding_size, distance, sparse_modifier),
+    )
+    return True
 
+def _source_filter(sources: str | list[str] | None) -> Filter | None:
+    if not sources:
+        return None
+    if isinstance(sources, str):
+        match = MatchValue(value=sources)
+    else:
+        match = MatchAny(any=sources)
+    return Filter(
+        must=[
+            FieldCondition(
+                key="metadata.source",
+                match=match
+            )
+        ]
+    )
+
+def _search_query(
+    mode: Literal["sparse", "dense", "hybrid"],
+    dense_vector,
+    sparse_vector,
+    k: int,
+) -> dict:
+    """
+    query_points arguments for a dense, sparse or hybrid (RRF) search.
+    """
     # DENSE MODE
     if mode == "dense":
-        dense_vector = model_dense.embed_query(query)
-        dense_vector = normalize(dense_vector)
-
-        result = client.query_points(
-            collection_name=collection_name,
-            query=dense_vector,
-            with_payload=True,
-            using="dense",
-            limit=k,
-            query_filter=query_filter
-        )
-
+        return {
+            "query": normalize(dense_vector),
+            "using": "dense",
+        }
     # SPARSE MODE
-    elif mode == "sparse":
-        sparse_vector = model_sparse.embed_query(query)
-
-        result = client.query_points(
-            collection_name=collection_name,
-            query=SparseVector(
+    if mode == "sparse":
+        return {
+            "query": SparseVector(
                 indices=sparse_vector.indices,
                 values=sparse_vector.values
             ),
-            limit=k,
-            with_payload=True,
-            using="sparse",
-            query_filter=query_filter
-        )
-
+            "using": "sparse",
+        }
     # HYBRID MODE
-    elif mode == "hybrid":
-        dense_vector = normalize(model_dense.embed_query(query))
-        sparse_vector = model_sparse.embed_query(query)
-
-        result = client.query_points(
-            collection_name=collection_name,
-            query=FusionQuery(fusion=Fusion.RRF),
-            query_filter=query_filter,
-            prefetch=[
+    if mode == "hybrid":
+        return {
+            "query": FusionQuery(fusion=Fusion.RRF),
+            "prefetch": [
                 Prefetch(
-                    query=dense_vector,
+                    query=normalize(dense_vector),
                     using="dense",
                     limit=k
                 ),
@@ -136,32 +174,215 @@ def search_collection(
                     limit=k
                 ),
             ],
-            limit=k,
-            with_payload=True
-        )
+        }
+    raise ValueError(f"Invalid mode: {mode}")
 
-    else:
+def search_collection(
+    client: QdrantClient,
+    collection_name: str,
+    query: str,   
+    model_dense = None,
+    model_sparse = None,
+    mode: Literal["sparse", "dense", "hybrid"] = "hybrid",
+    filenames: str | list[str] = None,
+    k: int = 5
+) -> list[dict]:
+    if mode not in ("sparse", "dense", "hybrid"):
+        raise ValueError(f"Invalid mode: {mode}")
+    dense_vector = model_dense.embed_query(query) if mode != "sparse" else None
+    sparse_vector = model_sparse.embed_query(query) if mode != "dense" else None
+    return client.query_points(
+        collection_name=collection_name,
+        query_filter=_source_filter(filenames),
+        limit=k,
+        with_payload=True,
+        **_search_query(mode, dense_vector, sparse_vector, k),
+    )
+
+async def asearch_collection(
+    client: AsyncQdrantClient,
+    collection_name: str,
+    query: str,
+    model_dense = None,
+    model_sparse = None,
+    mode: Literal["sparse", "dense", "hybrid"] = "hybrid",
+    filenames: str | list[str] = None,
+    k: int = 5
+) -> list[dict]:
+    if mode not in ("sparse", "dense", "hybrid"):
         raise ValueError(f"Invalid mode: {mode}")
+    dense_vector = await model_dense.aembed_query(query) if mode != "sparse" else None
+    sparse_vector = await model_sparse.aembed_query(query) if mode != "dense" else None
+    return await client.query_points(
+        collection_name=collection_name,
+        query_filter=_source_filter(filenames),
+        limit=k,
+        with_payload=True,
+        **_search_query(mode, dense_vector, sparse_vector, k),
+    )
 
-    return result
+def _source_selector(source: str) -> FilterSelector:
+    # Always an exact match: an empty source must not select every point
+    return FilterSelector(
+        filter=Filter(
+            must=[
+                FieldCondition(
+                    key="metadata.source",
+                    match=MatchValue(value=source)
+                )
+            ]
+        )
+    )
 
 def delete_points_by_source(
     client: QdrantClient,
     collection_name: str,
     source: str,
 ) -> None:
-    # Construct filter
-    delete_filter = Filter(
-        must=[
-            FieldCondition(
-                key="metadata.source",
-                match=MatchValue(value=source)
-            )
-        ]
-    )
-
     # Delete points matching the filter
     client.delete(
         collection_name=collection_name,
-        points_selector=FilterSelector(filter=delete_filter)
+        points_selector=_source_selector(source)
     )
+
+async def adelete_points_by_source(
+    client: AsyncQdrantClient,
+    collection_name: str,
+    source: str,
+) -> None:
+    await client.delete(
+        collection_name=collection_name,
+        points_selector=_source_selector(source)
+    )
+
+
+class AsyncQdrantVectorStore(QdrantVectorStore):
+    """
+    QdrantVectorStore whose async search and add methods use an
+    AsyncQdrantClient and the models' async embeddings, instead of running the
+    sync methods in the default executor. Sync methods keep using `client`.
+    """
+    def __init__(self, client: QdrantClient, async_client: AsyncQdrantClient, **kwargs):
+        super().__init__(client=client, **kwargs)
+        self.async_client = async_client
+
+    async def _aembed_query(self, query: str) -> tuple[Optional[list[float]], Any]:
+        dense, sparse = None, None
+        if self.retrieval_mode == RetrievalMode.DENSE:
+            dense = await self.embeddings.aembed_query(query)
+        elif self.retrieval_mode == RetrievalMode.SPARSE:
+            sparse = await self.sparse_embeddings.aembed_query(query)
+        elif self.retrieval_mode == RetrievalMode.HYBRID:
+            dense, sparse = await asyncio.gather(
+                self.embeddings.aembed_query(query),
+                self.sparse_embeddings.aembed_query(query),
+            )
+        else:
+            raise ValueError(f"Invalid retrieval mode. {self.retrieval_mode}.")
+        return dense, sparse
+
+    async def asimilarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Filter] = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        # Same queries as QdrantVectorStore.similarity_search_with_score
+        dense, sparse = await self._aembed_query(query)
+        query_options = {
+            "collection_name": self.collection_name,
+            "query_filter": filter,
+            "limit": k,
+            "with_payload": True,
+            "with_vectors": False,
+            **kwargs,
+        }
+        if self.retrieval_mode == RetrievalMode.DENSE:
+            response = await self.async_client.query_points(
+                query=dense, using=self.vector_name, **query_options
+            )
+        elif self.retrieval_mode == RetrievalMode.SPARSE:
+            response = await self.async_client.query_points(
+                query=SparseVector(indices=sparse.indices, values=sparse.values),
+                using=self.sparse_vector_name,
+                **query_options,
+            )
+        else:
+            response = await self.async_client.query_points(
+                prefetch=[
+                    Prefetch(using=self.vector_name, query=dense, filter=filter, limit=k),
+                    Prefetch(
+                        using=self.sparse_vector_name,
+                        query=SparseVector(indices=sparse.indices, values=sparse.values),
+                        filter=filter,
+                        limit=k,
+                    ),
+                ],
+                query=FusionQuery(fusion=Fusion.RRF),
+                **query_options,
+            )
+        return [
+            (
+                self._document_from_point(
+                    point,
+                    self.collection_name,
+                    self.content_payload_key,
+                    self.metadata_payload_key,
+                ),
+                point.score,
+            )
+            for point in response.points
+        ]
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> list[Document]:
+        results = await self.asimilarity_search_with_score(query, k, **kwargs)
+        return [document for document, _ in results]
+
+    async def _abuild_vectors(self, texts: list[str]) -> list[dict]:
+        dense, sparse = None, None
+        if self.retrieval_mode in (RetrievalMode.DENSE, RetrievalMode.HYBRID):
+            dense = await self.embeddings.aembed_documents(texts)
+        if self.retrieval_mode in (RetrievalMode.SPARSE, RetrievalMode.HYBRID):
+            sparse = await self.sparse_embeddings.aembed_documents(texts)
+        vectors = []
+        for i in range(len(texts)):
+            vector = {}
+            if dense is not None:
+                vector[self.vector_name] = dense[i]
+            if sparse is not None:
+                vector[self.sparse_vector_name] = SparseVector(
+                    indices=sparse[i].indices, values=sparse[i].values
+                )
+            vectors.append(vector)
+        return vectors
+
+    async def aadd_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict]] = None,
+        ids: Optional[Sequence[str | int]] = None,
+        batch_size: int = 64,
+        **kwargs: Any,
+    ) -> list[str | int]:
+        texts = list(texts)
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        added_ids = []
+        for start in range(0, len(texts), batch_size):
+            batch_texts = texts[start:start + batch_size]
+            batch_ids = ids[start:start + batch_size]
+            batch_metadatas = metadatas[start:start + batch_size] if metadatas else None
+            payloads = self._build_payloads(
+                batch_texts, batch_metadatas, self.content_payload_key, self.metadata_payload_key
+            )
+            vectors = await self._abuild_vectors(batch_texts)
+            await self.async_client.upsert(
+                collection_name=self.collection_name,
+                points=[
+                    PointStruct(id=point_id, vector=vector, payload=payload)
+                    for point_id, vector, payload in zip(batch_ids, vectors, payloads)
+                ],
+                **kwargs,
+            )
+            added_ids.extend(batch_ids)
+        return added_ids
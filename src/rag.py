@@ -1,4 +1,8 @@
-from typing import Literal, Optional, AsyncGenerator
+import uuid
+import asyncio
+from contextlib import aclosing
+from difflib import SequenceMatcher
+from typing import Callable, Literal, Optional, AsyncGenerator
 from typing_extensions import TypeAlias
 from langchain_core.documents import Document
 from langchain_core.runnables import Runnable
@@ -8,11 +12,27 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from src.loader import FileLoader
 from src.docstore import PostgresStore
 from src.llm import LLMProcessor
+from src.answer_cache import CachedAnswer, SemanticAnswerCache, replay_answer
+from src.cache import normalize_query
+from src.metrics import timed, instrumented
+from src.config import INDEX_BATCH_SIZE, SPECULATIVE_RETRIEVAL, SPECULATIVE_SIMILARITY
 
 RetrieverInput: TypeAlias = str
 RetrieverOutput: TypeAlias = list[Document]
 RetrieverLike: TypeAlias = Runnable[RetrieverInput, RetrieverOutput]
 
+def queries_match(a: str, b: str, threshold: float = SPECULATIVE_SIMILARITY) -> bool:
+    """
+    Whether two queries are identical or near-identical after normalization.
+    """
+    a, b = normalize_query(a), normalize_query(b)
+    return a == b or SequenceMatcher(None, a, b).ratio() >= threshold
+
+def _cancel(task: asyncio.Task) -> None:
+    task.cancel()
+    # Retrieve the outcome so a failed speculative task is not reported as unhandled
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
 class RAGPipeline:
     def __init__(
         self,
@@ -24,8 +44,10 @@ class RAGPipeline:
         index_retriever: Optional[RetrieverLike] = None,
         docstore: Optional[PostgresStore] = None,
         splitter: Optional[RecursiveCharacterTextSplitter] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
     ):
         self.processor = processor
+        self.answer_cache = answer_cache
         self.loader = loader
         self.vectorstore = vectorstore
         self.docstore = docstore        
@@ -44,18 +66,77 @@ class RAGPipeline:
         documents = self.loader.load(file_path=file_path, mode=mode)
         return documents   
 
+    async def aload(self, file_path: str, mode: Literal["single", "page"] = "page") -> list[Document]:
+        documents = await self.loader.aload(file_path=file_path, mode=mode)
+        return documents
+
     def _split(self, documents: list[Document]) -> list[Document]:
         if not self.splitter:
             raise ValueError("Splitter must be provided when use_parent_child=False")
         documents = self.splitter.split_documents(documents)
         return documents
 
-    async def index(self, documents: list[Document]) -> None:
-        if self.use_parent_child:
-            await self.index_retriever.aadd_documents(documents)
-        else:
-            documents = self._split(documents)
-            await self.vectorstore.aadd_documents(documents)
+    def _split_parent_child(
+        self,
+        documents: list[Document]
+    ) -> tuple[list[Document], list[tuple[str, Document]]]:
+        """
+        Split documents the way ParentDocumentRetriever.add_documents does:
+        parents from `parent_splitter`, each split into children carrying the
+        parent id under `id_key`.
+
+        Returns:
+            tuple: (children, [(parent id, parent)]).
+        """
+        retriever = self.index_retriever
+        if retriever.parent_splitter is not None:
+            documents = retriever.parent_splitter.split_documents(documents)
+        children, parents = [], []
+        for parent in documents:
+            parent_id = str(uuid.uuid4())
+            sub_docs = retriever.child_splitter.split_documents([parent])
+            for child in sub_docs:
+                if retriever.child_metadata_fields is not None:
+                    child.metadata = {k: child.metadata[k] for k in retriever.child_metadata_fields}
+                child.metadata[retriever.id_key] = parent_id
+            children.extend(sub_docs)
+            parents.append((parent_id, parent))
+        return children, parents
+
+    async def index(
+        self,
+        documents: list[Document],
+        on_progress: Optional[Callable[[str, int], None]] = None,
+        batch_size: int = INDEX_BATCH_SIZE,
+    ) -> None:
+        """
+        Index documents, embedding and upserting chunks in batches.
+
+        Args:
+            documents (list[Document]): Loaded documents.
+            on_progress (Callable): Optional callback receiving (stage, count) increments
+                for "chunks_total", "chunks_embedded", "points_upserted" and
+                "parents_stored".
+            batch_size (int): Number of chunks embedded and upserted per batch.
+        """
+        on_progress = on_progress or (lambda stage, count: None)
+        with timed("ingest", "split"):
+            if self.use_parent_child:
+                # Same steps as ParentDocumentRetriever.aadd_documents, batched for progress
+                chunks, parents = self._split_parent_child(documents)
+                vectorstore = self.index_retriever.vectorstore
+            else:
+                chunks, parents = self._split(documents), []
+                vectorstore = self.vectorstore
+        on_progress("chunks_total", len(chunks))
+        for i in range(0, len(chunks), batch_size):
+            batch = chunks[i:i + batch_size]
+            ids = await vectorstore.aadd_documents(batch)
+            on_progress("chunks_embedded", len(batch))
+            on_progress("points_upserted", len(ids))
+        if parents:
+            written = await self.index_retriever.docstore.amset(parents)
+            on_progress("parents_stored", written)
 
     async def _expand_with_neighbors(
         self,
@@ -66,22 +147,22 @@ class RAGPipeline:
         """
         if not self.docstore:
             return documents
+        # Fetch all neighbors (and any unresolved current keys) in one round trip
+        keys, neighbors = await self.docstore.amget_neighbors(documents)
         seen = set()
         expanded = []
-        for doc in documents:
-            current_key = await self.docstore.aget_key_by_value(doc)
+        for doc, current_key in zip(documents, keys):
             if current_key and current_key not in seen:
                 seen.add(current_key)
                 expanded.append(doc)
             for key_field in ["prev_key", "next_key"]:
                 key = doc.metadata.get(key_field)
-                if key and key not in seen:
-                    neighbor_docs = await self.docstore.amget((key,))
-                    if neighbor_docs:
-                        seen.add(key)
-                        expanded.append(neighbor_docs[0])
+                if key and key not in seen and key in neighbors:
+                    seen.add(key)
+                    expanded.append(neighbors[key])
         return expanded
 
+    @instrumented("chat", "retrieve")
     async def retrieve(self, query: str, expand_context: bool = False) -> list[dict]:
         """
         Retrieve documents relevant to a query.
@@ -95,13 +176,22 @@ class RAGPipeline:
         documents = await self.query_retriever.ainvoke(query)
         if expand_context:
             documents = await self._expand_with_neighbors(documents)
+        # Parent documents carry their docstore key, only resolve the rest
+        keys = [doc.metadata.get(self.docstore.key_field) for doc in documents]
+        missing = [i for i, key in enumerate(keys) if key is None]
+        if missing:
+            resolved = await self.docstore.aget_keys_by_values(
+                [documents[i] for i in missing]
+            )
+            for i, key in zip(missing, resolved):
+                keys[i] = key
         seen = set()
         sources = []
-        for doc in documents:
-            key = await self.docstore.aget_key_by_value(doc)
+        for doc, key in zip(documents, keys):
             if key not in seen:
                 seen.add(key)
                 sources.append({
+                    "key": key,
                     "name": doc.metadata.get("source", "Unknown").split("/")[-1],
                     "page": doc.metadata.get("page_label") or doc.metadata.get("page"),
                     "order": doc.metadata.get("order"),
@@ -112,21 +202,131 @@ class RAGPipeline:
             s.pop("order", None)
         return sources
 
+    async def corpus_version(self) -> Optional[int]:
+        if not self.answer_cache:
+            return None
+        return await self.answer_cache.sync_version()
+
+    async def lookup_answer(
+        self,
+        query: str,
+        expand_context: bool = False,
+        corpus_version: Optional[int] = None
+    ) -> Optional[CachedAnswer]:
+        if not self.answer_cache:
+            return None
+        return await self.answer_cache.alookup(
+            query, expand_context=expand_context, version=corpus_version
+        )
+
+    async def store_answer(
+        self,
+        query: str,
+        answer: str,
+        sources: list[dict],
+        corpus_version: Optional[int],
+        expand_context: bool = False
+    ) -> None:
+        """
+        Cache an answer. `corpus_version` is the version returned by
+        `rewrite_and_retrieve` for its sources; the answer is not cached if
+        files were added or deleted since.
+        """
+        if self.answer_cache and answer and corpus_version is not None:
+            await self.answer_cache.astore(
+                query, answer, sources, corpus_version, expand_context=expand_context
+            )
+
+    async def rewrite_and_retrieve(
+        self,
+        message: str,
+        chat_history: Optional[list[dict]] = None,
+        expand_context: bool = False,
+        speculative: bool = SPECULATIVE_RETRIEVAL
+    ) -> tuple[Optional[str], str, list[dict], Optional[CachedAnswer], Optional[int]]:
+        """
+        Rewrite the message and retrieve sources for the rewritten query.
+
+        In speculative mode, retrieval for the raw message starts concurrently
+        with the rewrite LLM call. Its result is reused when the rewrite is
+        identical or near-identical to the message; otherwise it is cancelled
+        and retrieval runs again on the rewritten query. Cancelling does not
+        stop embedding or reranking already handed to the executors, so a
+        mismatched rewrite costs two full retrievals.
+
+        Returns:
+            tuple: (rewritten_query, fallback_message, sources, cached answer,
+            corpus version). rewritten_query is None when the message cannot be
+            answered. The corpus version is read before any retrieval starts
+            (None without an answer cache) and must be passed to `store_answer`.
+        """
+        # Read before retrieving, so an answer is never cached under a newer
+        # version than the sources it is based on
+        corpus_version = await self.corpus_version()
+        speculative_task = None
+        if speculative:
+            speculative_task = asyncio.create_task(
+                self.retrieve(query=message, expand_context=expand_context)
+            )
+        try:
+            rewritten_query, fallback_message = await self.processor.query_rewrite(message, chat_history)
+            if not rewritten_query:
+                return None, fallback_message, [], None, corpus_version
+            cached = await self.lookup_answer(
+                rewritten_query, expand_context=expand_context, corpus_version=corpus_version
+            )
+            if cached:
+                return rewritten_query, fallback_message, cached.sources, cached, corpus_version
+            if speculative_task and queries_match(message, rewritten_query):
+                sources = await speculative_task
+            else:
+                if speculative_task:
+                    _cancel(speculative_task)
+                sources = await self.retrieve(query=rewritten_query, expand_context=expand_context)
+            return rewritten_query, fallback_message, sources, None, corpus_version
+        finally:
+            if speculative_task and not speculative_task.done():
+                _cancel(speculative_task)
+
     async def generate(
         self,
         message: str,
         chat_history: Optional[list[dict]] = None,
-        expand_context: bool = False
-    ) -> AsyncGenerator[str, None]:       
+        expand_context: bool = False,
+        on_sources: Optional[Callable[[list[dict]], None]] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream the answer to a message.
 
-        rewritten_query, fallback_message = await self.processor.query_rewrite(message, chat_history)
+        Args:
+            message (str): The user message.
+            chat_history: Previous turns, formatted into the rewrite prompt.
+            expand_context (bool): If True, also include ±1 neighboring documents.
+            on_sources (Callable): Optional callback receiving the sources the
+                answer is based on, called before the first chunk.
+        """
+        rewritten_query, fallback_message, sources, cached, corpus_version = await self.rewrite_and_retrieve(
+            message,
+            chat_history,
+            expand_context=expand_context
+        )
+        if on_sources:
+            on_sources(sources)
         if not rewritten_query:
             yield fallback_message
             return
-        sources = await self.retrieve(
-            query=rewritten_query,
-            expand_with_neighbors=expand_context
-        )
+        if cached:
+            async for chunk in replay_answer(cached.answer):
+                yield chunk
+            return
         context = self.processor.build_context(sources)
-        async for chunk in self.processor.final_answer(rewritten_query, context):
-            yield chunk
+        chunks = []
+        # Closing the generator (e.g. on client disconnect) closes the LLM stream
+        async with aclosing(self.processor.final_answer(rewritten_query, context)) as stream:
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        # Only complete answers are cached
+        await self.store_answer(
+            rewritten_query, "".join(chunks), sources, corpus_version, expand_context=expand_context
+        )
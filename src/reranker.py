@@ -0,0 +1,145 @@
+import os
+from typing import Literal, Optional
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from langchain_community.cross_encoders.base import BaseCrossEncoder
+
+from src.config import (
+    RERANK_MAX_LENGTH,
+    RERANK_BATCH_SIZE,
+    RERANK_NUM_THREADS,
+    RERANK_ONNX_DIR,
+)
+
+
+class FastCrossEncoder(BaseCrossEncoder):
+    """
+    CPU-oriented cross-encoder scorer, a drop-in for HuggingFaceCrossEncoder
+    in CrossEncoderReranker.
+
+    - (query, candidate) pairs are tokenized once with the candidate truncated
+      to a `max_length` token budget, sorted by length and scored in
+      length-bucketed batches, so short pairs are not padded to long ones
+    - backend="torch" runs the transformers model, optionally with dynamic
+      int8 quantization of its Linear layers
+    - backend="onnx" exports the model once to `onnx_dir` and runs it with
+      ONNX Runtime on `num_threads` threads, optionally int8-quantized (which
+      needs the `onnx` package); a failed export or quantization raises. The
+      torch backend uses the process-wide torch thread count (TORCH_NUM_THREADS)
+
+    Scores match HuggingFaceCrossEncoder: sigmoid of the logit for
+    single-label models, the "relevant" logit for two-label models.
+    """
+    def __init__(
+        self,
+        model_name: str,
+        backend: Literal["torch", "onnx"] = "torch",
+        quantize: bool = False,
+        max_length: int = RERANK_MAX_LENGTH,
+        batch_size: int = RERANK_BATCH_SIZE,
+        num_threads: int = RERANK_NUM_THREADS,
+        onnx_dir: str = RERANK_ONNX_DIR,
+        trust_remote_code: bool = True,
+    ):
+        self.model_name = model_name
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.quantize = quantize
+        self.tokenizer = AutoTokenizer.from_pretrained(
+            model_name, trust_remote_code=trust_remote_code
+        )
+        self.model = AutoModelForSequenceClassification.from_pretrained(
+            model_name, trust_remote_code=trust_remote_code
+        ).eval()
+        # Fix for "ValueError: Cannot handle batch_size > 1 if no padding token is defined"
+        if self.model.config.pad_token_id is None:
+            self.model.config.pad_token_id = self.tokenizer.pad_token_id
+        self.num_labels = self.model.config.num_labels
+
+        self.session = None
+        self.backend = backend
+        if backend == "onnx":
+            # Raises rather than silently running the (slower) torch backend
+            self.session = self._load_onnx(onnx_dir, num_threads)
+        elif quantize:
+            self.model = torch.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+
+    def _load_onnx(self, onnx_dir: str, num_threads: int):
+        import onnxruntime as ort
+
+        model_dir = os.path.join(onnx_dir, self.model_name.replace("/", "__"))
+        model_path = os.path.join(model_dir, "model.onnx")
+        if not os.path.exists(model_path):
+            os.makedirs(model_dir, exist_ok=True)
+            dummy = self.tokenizer([("query", "document")], return_tensors="pt")
+            input_names = list(dummy.keys())
+            # Exported under a temporary name so a failed export is not reused
+            tmp_path = f"{model_path}.tmp"
+            torch.onnx.export(
+                self.model,
+                tuple(dummy[name] for name in input_names),
+                tmp_path,
+                input_names=input_names,
+                output_names=["logits"],
+                dynamic_axes={
+                    **{name: {0: "batch", 1: "sequence"} for name in input_names},
+                    "logits": {0: "batch"},
+                },
+                opset_version=17,
+            )
+            os.replace(tmp_path, model_path)
+        if self.quantize:
+            quantized_path = os.path.join(model_dir, "model.int8.onnx")
+            if not os.path.exists(quantized_path):
+                from onnxruntime.quantization import quantize_dynamic, QuantType
+                tmp_path = f"{quantized_path}.tmp"
+                quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+                os.replace(tmp_path, quantized_path)
+            model_path = quantized_path
+
+        options = ort.SessionOptions()
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.onnx_inputs = [i.name for i in session.get_inputs()]
+        return session
+
+    def _logits(self, features: dict) -> np.ndarray:
+        if self.session is not None:
+            inputs = {name: features[name].numpy() for name in self.onnx_inputs}
+            return self.session.run(None, inputs)[0]
+        with torch.inference_mode():
+            return self.model(**features).logits.float().numpy()
+
+    def _activation(self, logits: np.ndarray) -> np.ndarray:
+        if self.num_labels == 1:
+            return 1 / (1 + np.exp(-logits[:, 0]))
+        return logits[:, 1]
+
+    def score(self, text_pairs: list[tuple[str, str]]) -> list[float]:
+        if not text_pairs:
+            return []
+        # Tokenize once, truncating only the candidate to the token budget
+        encoded = self.tokenizer(
+            [query for query, _ in text_pairs],
+            [candidate for _, candidate in text_pairs],
+            truncation="only_second",
+            max_length=self.max_length,
+        )
+        lengths = np.array([len(ids) for ids in encoded["input_ids"]])
+        order = np.argsort(lengths, kind="stable")
+        scores = np.empty(len(text_pairs), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            features = self.tokenizer.pad(
+                {key: [encoded[key][i] for i in batch] for key in encoded.keys()},
+                return_tensors="pt",
+            )
+            scores[batch] = self._activation(self._logits(features))
+        return scores.tolist()
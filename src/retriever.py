@@ -1,16 +1,220 @@
+import time
+import operator
+from typing import Any, Optional, Sequence
+from langchain_core.callbacks import (
+    Callbacks,
+    CallbackManagerForRetrieverRun,
+    AsyncCallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.stores import BaseStore
+from langchain_core.vectorstores import VectorStore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.retrievers import ParentDocumentRetriever, ContextualCompressionRetriever
 from langchain.retrievers.document_compressors import CrossEncoderReranker
-from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+from langchain_community.cross_encoders.base import BaseCrossEncoder
 
+from src.logger import logger
+from src.metrics import registry, instrumented, observe_stage
+from src.executor import model_executor
+from src.cache import RerankScoreCache
 from src.config import (
     PARENT_CHUNK_SIZE,
     PARENT_CHUNK_OVERLAP,
     USE_PARENT_CHILD,
     CHUNK_SIZE,
     CHUNK_OVERLAP,
+    CASCADE_MIN_K,
+    CASCADE_SCORE_RATIO,
+    CASCADE_BATCH_SIZE,
+    CASCADE_MARGIN,
+)
+
+rerank_pairs_scored = registry.histogram(
+    "rerank_pairs_scored",
+    "Cross-encoder pairs scored per query by the cascade reranker",
+    buckets=(1, 2, 4, 6, 8, 10, 12, 16, 20, 30, 50),
+)
+rerank_early_exits = registry.counter(
+    "rerank_early_exits_total",
+    "Queries where the cascade reranker stopped before scoring all candidates",
 )
 
+
+def score_documents(
+    model: BaseCrossEncoder,
+    query: str,
+    documents: Sequence[Document],
+    cache: Optional[RerankScoreCache] = None,
+) -> list[float]:
+    if cache is not None:
+        return cache.score(model, query, documents)
+    return list(model.score([(query, doc.page_content) for doc in documents]))
+
+
+class CachedCrossEncoderReranker(CrossEncoderReranker):
+    """
+    CrossEncoderReranker that only sends (query, chunk) pairs missing from
+    the score cache to the cross-encoder.
+    """
+    cache: Optional[RerankScoreCache] = None
+
+    @instrumented("chat", "rerank")
+    def compress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Optional[Callbacks] = None,
+    ) -> Sequence[Document]:
+        scores = score_documents(self.model, query, documents, self.cache)
+        docs_with_scores = sorted(zip(documents, scores), key=operator.itemgetter(1), reverse=True)
+        return [doc for doc, _ in docs_with_scores[: self.top_n]]
+
+
+class CascadeRerankRetriever(BaseRetriever):
+    """
+    Hybrid retrieval followed by cascade cross-encoder reranking.
+
+    1. Child chunks are retrieved with their fusion scores (up to `max_k`) and,
+       when a docstore is given, grouped into parents in rank order.
+    2. The candidate count adapts to the score distribution: candidates
+       scoring at least `score_ratio` x the best fusion score are kept,
+       clamped to [`min_k`, `max_k`].
+    3. Candidates are reranked in fusion order in batches of `batch_size`.
+       Scoring stops early once a batch leaves the top-n unchanged and its
+       best score is at least `margin` below the n-th best score.
+
+    Each returned document carries `rerank_score` in its metadata; per-query
+    stats are logged at debug level and recorded in the metrics registry.
+    Pairs found in the optional score cache are not sent to the model.
+    """
+    vectorstore: VectorStore
+    model: Any
+    cache: Optional[Any] = None
+    docstore: Optional[BaseStore] = None
+    id_key: str = "doc_id"
+    top_n: int = 3
+    min_k: int = CASCADE_MIN_K
+    max_k: int = 20
+    score_ratio: float = CASCADE_SCORE_RATIO
+    batch_size: int = CASCADE_BATCH_SIZE
+    margin: float = CASCADE_MARGIN
+
+    def _select_candidates(self, hits: list[tuple[Document, float]]) -> list[tuple[Any, float]]:
+        """
+        Returns (parent id or child document, fusion score) in rank order,
+        truncated to the adaptive candidate count.
+        """
+        if self.docstore is not None:
+            candidates, seen = [], set()
+            for child, score in hits:
+                parent_id = child.metadata.get(self.id_key)
+                if parent_id is not None and parent_id not in seen:
+                    seen.add(parent_id)
+                    candidates.append((parent_id, score))
+        else:
+            candidates = hits
+        if not candidates:
+            return []
+        cutoff = candidates[0][1] * self.score_ratio
+        count = sum(1 for _, score in candidates if score >= cutoff)
+        count = max(self.min_k, min(self.max_k, count))
+        return candidates[:count]
+
+    def _update(
+        self,
+        scored: list[tuple[Document, float]],
+        batch_scores: list[float],
+        previous_top: list[int],
+    ) -> tuple[list[int], bool]:
+        """
+        Returns the indices of the current top-n in `scored` and whether the
+        cascade can stop.
+        """
+        ranking = sorted(range(len(scored)), key=lambda i: scored[i][1], reverse=True)
+        top = ranking[:self.top_n]
+        if len(top) < self.top_n or sorted(top) != sorted(previous_top):
+            return top, False
+        nth_score = scored[top[-1]][1]
+        return top, nth_score - max(batch_scores) >= self.margin
+
+    def _finish(
+        self,
+        query: str,
+        scored: list[tuple[Document, float]],
+        top: list[int],
+        num_candidates: int,
+        num_batches: int,
+    ) -> list[Document]:
+        pairs_scored = len(scored)
+        rerank_pairs_scored.observe(pairs_scored)
+        if pairs_scored < num_candidates:
+            rerank_early_exits.inc()
+        logger.debug(
+            f"Cascade rerank: candidates={num_candidates} pairs_scored={pairs_scored} "
+            f"batches={num_batches} early_exit={pairs_scored < num_candidates} query={query!r}"
+        )
+        results = []
+        for i in top:
+            document, score = scored[i]
+            results.append(
+                Document(
+                    page_content=document.page_content,
+                    metadata={**document.metadata, "rerank_score": score},
+                )
+            )
+        return results
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        hits = self.vectorstore.similarity_search_with_score(query, k=self.max_k)
+        candidates = self._select_candidates(hits)
+        if self.docstore is not None:
+            parents = self.docstore.mget([parent_id for parent_id, _ in candidates])
+            documents = [doc for doc in parents if doc is not None]
+        else:
+            documents = [doc for doc, _ in candidates]
+        scored, top, num_batches = [], [], 0
+        rerank_start = time.perf_counter()
+        for start in range(0, len(documents), self.batch_size):
+            batch = documents[start:start + self.batch_size]
+            batch_scores = score_documents(self.model, query, batch, self.cache)
+            scored.extend(zip(batch, batch_scores))
+            num_batches += 1
+            top, stop = self._update(scored, batch_scores, top)
+            if stop:
+                break
+        observe_stage("chat", "rerank", time.perf_counter() - rerank_start)
+        return self._finish(query, scored, top, len(documents), num_batches)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        hits = await self.vectorstore.asimilarity_search_with_score(query, k=self.max_k)
+        candidates = self._select_candidates(hits)
+        if self.docstore is not None:
+            parents = await self.docstore.amget([parent_id for parent_id, _ in candidates])
+            documents = [doc for doc in parents if doc is not None]
+        else:
+            documents = [doc for doc, _ in candidates]
+        scored, top, num_batches = [], [], 0
+        rerank_start = time.perf_counter()
+        for start in range(0, len(documents), self.batch_size):
+            batch = documents[start:start + self.batch_size]
+            batch_scores = await model_executor.run(
+                score_documents, self.model, query, batch, self.cache
+            )
+            scored.extend(zip(batch, batch_scores))
+            num_batches += 1
+            top, stop = self._update(scored, batch_scores, top)
+            if stop:
+                break
+        observe_stage("chat", "rerank", time.perf_counter() - rerank_start)
+        return self._finish(query, scored, top, len(documents), num_batches)
+
+
 class RetrieverFactory:
     def __init__(
         self,
@@ -28,10 +232,22 @@ class RetrieverFactory:
         parent_chunk_size: int = PARENT_CHUNK_SIZE,
         parent_chunk_overlap: int = PARENT_CHUNK_OVERLAP,
         rerank: bool = True,
-        model_rerank: HuggingFaceCrossEncoder = None,
+        model_rerank: BaseCrossEncoder = None,
         k: int = 20,
-        top_n: int = 3
+        top_n: int = 3,
+        cascade: bool = False,
+        score_cache: Optional[RerankScoreCache] = None,
     ):
+        if rerank and model_rerank and cascade:
+            return CascadeRerankRetriever(
+                vectorstore=self.vectorstore,
+                docstore=self.docstore if use_parent_child else None,
+                model=model_rerank,
+                cache=score_cache,
+                max_k=k,
+                top_n=top_n,
+            )
+
         if use_parent_child:
             parent_splitter = RecursiveCharacterTextSplitter(
                 chunk_size=parent_chunk_size,
@@ -53,7 +269,9 @@ class RetrieverFactory:
 
         if rerank and model_rerank:
             retriever = ContextualCompressionRetriever(
-                base_compressor=CrossEncoderReranker(model=model_rerank, top_n=top_n),
+                base_compressor=CachedCrossEncoderReranker(
+                    model=model_rerank, top_n=top_n, cache=score_cache
+                ),
                 base_retriever=base_retriever,
             )
         else:
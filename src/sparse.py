@@ -0,0 +1,30 @@
+import numpy as np
+from langchain_qdrant.sparse_embeddings import SparseVector
+
+
+def coo_to_sparse_vectors(rows, cols, values, n_rows: int) -> list[SparseVector]:
+    """
+    Converts a batch of sparse embeddings in COO form into one SparseVector
+    per row, in a few vectorized passes instead of a Python loop per entry.
+    Entries may come in any order and repeat an index: repeats are summed,
+    as torch's coalesce() does, and each row's indices come out sorted.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float32)
+    order = np.lexsort((cols, rows))
+    rows, cols, values = rows[order], cols[order], values[order]
+
+    # First entry of each distinct (row, col)
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+    starts = np.flatnonzero(first)
+    if len(starts) < len(rows):
+        values = np.add.reduceat(values, starts)
+        rows, cols = rows[starts], cols[starts]
+
+    bounds = np.searchsorted(rows, np.arange(1, n_rows))
+    return [
+        SparseVector(indices=row_cols.tolist(), values=row_values.tolist())
+        for row_cols, row_values in zip(np.split(cols, bounds), np.split(values, bounds))
+    ]
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+from typing import Any, BinaryIO
+
+from src.config import UPLOAD_SPOOL_DIR
+
+
+class TeeReader:
+    """
+    File-like wrapper that copies every chunk read from `source` into `sink`,
+    so a single pass over an upload can feed object storage and a local spool.
+    """
+    def __init__(self, source: BinaryIO, sink: BinaryIO):
+        self.source = source
+        self.sink = sink
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.source.read(size)
+        if chunk:
+            self.sink.write(chunk)
+            self.bytes_read += len(chunk)
+        return chunk
+
+
+class UploadSpool:
+    """
+    Private on-disk copy of an uploaded file, readable by the file loaders.
+    Each spool lives in its own temporary directory so concurrent uploads
+    with the same filename do not clobber each other.
+    """
+    def __init__(self, filename: str, root: str | None = UPLOAD_SPOOL_DIR):
+        self.dir = tempfile.mkdtemp(prefix="upload_", dir=root)
+        self.path = os.path.join(self.dir, os.path.basename(filename))
+
+    def open(self) -> BinaryIO:
+        return open(self.path, "wb")
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+async def spool_upload(
+    mc: Any,
+    bucket_name: str,
+    object_name: str,
+    source: BinaryIO,
+    filename: str,
+    content_type: str = "application/octet-stream",
+    root: str | None = UPLOAD_SPOOL_DIR,
+) -> UploadSpool:
+    """
+    Streams `source` to object storage through `mc.aupload_stream`, teeing
+    the bytes into a new spool. If the upload fails or is cancelled, the
+    spool is removed before the error propagates.
+    """
+    spool = UploadSpool(filename, root=root)
+    try:
+        with spool.open() as sink:
+            await mc.aupload_stream(
+                bucket_name=bucket_name,
+                data=TeeReader(source, sink),
+                object_name=object_name,
+                content_type=content_type
+            )
+    except BaseException:
+        spool.cleanup()
+        raise
+    return spool
@@ -0,0 +1,60 @@
+import time
+import asyncio
+from typing import AsyncIterator, Callable, Optional
+
+from src.config import STREAM_FLUSH_MS, STREAM_FLUSH_BYTES
+
+
+async def coalesce(
+    stream: AsyncIterator[str],
+    interval_ms: float = STREAM_FLUSH_MS,
+    max_bytes: int = STREAM_FLUSH_BYTES,
+    stop: Optional[Callable[[], bool]] = None,
+) -> AsyncIterator[str]:
+    """
+    Groups a stream of small chunks into frames. A frame is emitted once
+    `interval_ms` has passed since its first chunk or once it holds
+    `max_bytes` characters, whichever comes first, and the rest is emitted
+    when the stream ends. `stop` is polled at least once per interval; when it
+    returns True the stream is closed and buffered chunks are dropped.
+    """
+    interval = interval_ms / 1000
+    stop = stop or (lambda: False)
+    iterator = aiter(stream)
+    buffer: list[str] = []
+    size = 0
+    deadline = None
+    pending: Optional[asyncio.Future] = None
+    try:
+        while not stop():
+            if pending is None:
+                pending = asyncio.ensure_future(anext(iterator))
+            timeout = interval if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = await asyncio.wait((pending,), timeout=timeout)
+            if done:
+                try:
+                    chunk = pending.result()
+                except StopAsyncIteration:
+                    pending = None
+                    if buffer and not stop():
+                        yield "".join(buffer)
+                    return
+                pending = None
+                if stop():
+                    return
+                if not buffer:
+                    deadline = time.monotonic() + interval
+                buffer.append(chunk)
+                size += len(chunk)
+            if buffer and (size >= max_bytes or time.monotonic() >= deadline):
+                yield "".join(buffer)
+                buffer.clear()
+                size = 0
+                deadline = None
+    finally:
+        if pending is not None:
+            # Let the cancelled step finish before closing the stream
+            pending.cancel()
+            await asyncio.wait((pending,))
+        if hasattr(stream, "aclose"):
+            await stream.aclose()
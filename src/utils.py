@@ -13,3 +13,14 @@ def extract_json_str(text):
         return json_str
     except ValueError:
         return None
+
+def format_chat_history(history, turns=5):
+    """
+    Formats the last turns of a chat history for the query rewrite prompt.
+    Args:
+        history (list[dict]): Turns with "role" and "content" keys.
+        turns (int): Number of most recent turns to keep.
+    Returns:
+        str: One "Role: content" line per turn.
+    """
+    return "\n".join(f"{item['role'].capitalize()}: {item['content']}" for item in history[-turns:])
@@ -0,0 +1,46 @@
+import asyncio
+
+from langchain_core.embeddings import Embeddings
+
+from src.answer_cache import SemanticAnswerCache
+
+
+class ConstantEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def make_cache(versions: list[int]) -> SemanticAnswerCache:
+    async def version_provider():
+        return versions[0]
+    return SemanticAnswerCache(ConstantEmbeddings(), version_provider)
+
+
+def test_answer_is_cached_at_its_retrieval_version():
+    versions = [1]
+    cache = make_cache(versions)
+
+    async def scenario():
+        version = await cache.sync_version()
+        await cache.astore("q", "answer", [], version)
+        return await cache.alookup("q")
+
+    assert asyncio.run(scenario()).answer == "answer"
+
+
+def test_answer_retrieved_before_a_corpus_change_is_not_cached():
+    versions = [1]
+    cache = make_cache(versions)
+
+    async def scenario():
+        version = await cache.sync_version()
+        # A file is uploaded while the answer is generated
+        versions[0] = 2
+        await cache.astore("q", "stale", [], version)
+        return await cache.alookup("q")
+
+    assert asyncio.run(scenario()) is None
+    assert cache.stats()["entries"] == 0
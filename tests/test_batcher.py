@@ -0,0 +1,63 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from src.batcher import EmbeddingBatcher
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_cancelled_aembed_does_not_stop_the_worker():
+    release = threading.Event()
+
+    def embed_batch(texts):
+        release.wait(5)
+        return [len(text) for text in texts]
+
+    batcher = EmbeddingBatcher(embed_batch, name="test_cancel", max_wait_ms=50)
+
+    async def scenario():
+        # The first batch blocks, so the second request is still pending when cancelled
+        first = asyncio.ensure_future(batcher.aembed("a"))
+        await asyncio.sleep(0.1)
+        cancelled = asyncio.ensure_future(batcher.aembed("bb"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        release.set()
+        assert await first == 1
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await asyncio.wait_for(batcher.aembed("ccc"), timeout=2)
+
+    assert run(scenario()) == 3
+    assert batcher._thread.is_alive()
+
+
+def test_short_batch_fails_leftover_futures():
+    batcher = EmbeddingBatcher(lambda texts: [0], name="test_short", max_wait_ms=50)
+    futures = [batcher.submit("a"), batcher.submit("b")]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=2)
+    # The worker survives and serves the next batch
+    assert batcher.embed("c") == 0
+
+
+def test_embed_batch_error_is_propagated():
+    calls = []
+
+    def embed_batch(texts):
+        calls.append(texts)
+        if len(calls) == 1:
+            raise ValueError("boom")
+        return texts
+
+    batcher = EmbeddingBatcher(embed_batch, name="test_error", max_wait_ms=1)
+    with pytest.raises(ValueError):
+        batcher.embed("a")
+    time.sleep(0.01)
+    assert batcher.embed("b") == "b"
@@ -0,0 +1,132 @@
+import sys
+import json
+import types
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# src.api.chat imports the pipeline from src.builder, which loads the models
+if "src.builder" not in sys.modules:
+    sys.modules["src.builder"] = types.SimpleNamespace(pipeline=None)
+from src.api import chat  # noqa: E402
+
+SOURCES = [{"key": "k0", "name": "a.pdf", "page": 1, "content": "not sent"}]
+
+
+class StubStream:
+    """
+    LLM stream stand-in: yields `tokens`, then raises `error` if given.
+    """
+    def __init__(self, tokens, error=None):
+        self.tokens = list(tokens)
+        self.error = error
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.tokens:
+            return self.tokens.pop(0)
+        if self.error:
+            raise self.error
+        raise StopAsyncIteration
+
+    async def aclose(self):
+        self.closed = True
+
+
+class StubPipeline:
+    def __init__(self, stream):
+        self.stream = stream
+        self.calls = []
+
+    def generate(self, message, chat_history=None, expand_context=False, on_sources=None):
+        self.calls.append((message, chat_history, expand_context))
+        on_sources(SOURCES)
+        return self.stream
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+    return TestClient(app)
+
+
+def events(response):
+    parsed = []
+    for frame in response.text.strip().split("\n\n"):
+        event, data = frame.split("\n")
+        parsed.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return parsed
+
+
+def test_chat_streams_tokens_then_sources_and_done(client, monkeypatch):
+    stream = StubStream(["Hello", ", world"])
+    pipeline = StubPipeline(stream)
+    monkeypatch.setattr(chat, "pipeline", pipeline)
+    body = {"message": "hi", "history": [{"role": "user", "content": "before"}], "expand_context": True}
+    response = client.post("/chat", json=body)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert events(response) == [
+        ("token", {"text": "Hello"}),
+        ("token", {"text": ", world"}),
+        ("sources", [{"key": "k0", "name": "a.pdf", "page": 1}]),
+        ("done", {}),
+    ]
+    assert pipeline.calls == [("hi", "User: before", True)]
+    assert stream.closed
+
+
+def test_chat_reports_a_failed_stream_as_an_error_event(client, monkeypatch):
+    stream = StubStream(["Hello"], error=RuntimeError("LLM down"))
+    monkeypatch.setattr(chat, "pipeline", StubPipeline(stream))
+    response = client.post("/chat", json={"message": "hi"})
+
+    assert events(response) == [
+        ("token", {"text": "Hello"}),
+        ("error", {"detail": "Internal Server Error"}),
+    ]
+    assert stream.closed
+
+
+class DisconnectingRequest:
+    def __init__(self, after):
+        self.checks = 0
+        self.after = after
+
+    async def is_disconnected(self):
+        self.checks += 1
+        return self.checks > self.after
+
+
+def test_chat_closes_the_llm_stream_when_the_client_disconnects(monkeypatch):
+    stream = StubStream(["a", "b", "c", "d"])
+    monkeypatch.setattr(chat, "pipeline", StubPipeline(stream))
+
+    async def scenario():
+        body = chat.ChatRequest(message="hi")
+        return [frame async for frame in chat.chat_events(DisconnectingRequest(after=1), body)]
+
+    frames = asyncio.run(scenario())
+    assert frames == [chat.sse("token", {"text": "a"})]
+    assert stream.closed
+
+
+def test_chat_closes_the_llm_stream_when_the_response_is_cancelled(monkeypatch):
+    stream = StubStream(["a", "b"])
+    monkeypatch.setattr(chat, "pipeline", StubPipeline(stream))
+
+    async def scenario():
+        events = chat.chat_events(DisconnectingRequest(after=100), chat.ChatRequest(message="hi"))
+        first = await anext(events)
+        await events.aclose()
+        return first
+
+    assert asyncio.run(scenario()) == chat.sse("token", {"text": "a"})
+    assert stream.closed
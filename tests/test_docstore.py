@@ -0,0 +1,209 @@
+import asyncio
+
+import pytest
+from langchain_core.documents import Document
+from sqlalchemy.dialects import postgresql
+
+from src.docstore import PostgresStore
+
+
+class FakeSession:
+    """
+    Session stand-in returning canned rows and recording executed statements.
+    """
+    def __init__(self, rows=(), fail=False):
+        self.rows = list(rows)
+        self.fail = fail
+        self.statements = []
+        self.committed = False
+        self.rolled_back = False
+
+    def execute(self, stmt):
+        if self.fail:
+            raise RuntimeError("connection lost")
+        self.statements.append(stmt)
+        return FakeResult(self.rows)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeAsyncSession(FakeSession):
+    async def execute(self, stmt):
+        return FakeSession.execute(self, stmt)
+
+    async def commit(self):
+        FakeSession.commit(self)
+
+    async def rollback(self):
+        FakeSession.rollback(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def all(self):
+        return list(self.rows)
+
+
+def make_store(rows=(), fail=False, **kwargs):
+    session, async_session = FakeSession(rows, fail), FakeAsyncSession(rows, fail)
+    store = PostgresStore(lambda: session, lambda: async_session, **kwargs)
+    return store, session, async_session
+
+
+def pairs(n, source="a.pdf"):
+    return [
+        (f"k{i}", Document(page_content=f"chunk {i}", metadata={"source": source, "page": i}))
+        for i in range(n)
+    ]
+
+
+def compile_pg(stmt):
+    return stmt.compile(dialect=postgresql.dialect())
+
+
+def test_serialize_pairs_links_neighbors_at_the_boundaries():
+    store, _, _ = make_store()
+    serialized = store.serialize_pairs(pairs(3))
+    links = [
+        (key, value["metadata"]["prev_key"], value["metadata"]["next_key"], value["metadata"]["order"])
+        for key, value in serialized
+    ]
+    assert links == [
+        ("k0", None, "k1", 0),
+        ("k1", "k0", "k2", 1),
+        ("k2", "k1", None, 2),
+    ]
+
+
+def test_serialize_pairs_of_a_single_chunk_has_no_neighbors():
+    store, _, _ = make_store()
+    [(_, value)] = store.serialize_pairs(pairs(1))
+    assert value["metadata"]["prev_key"] is None
+    assert value["metadata"]["next_key"] is None
+    assert value["metadata"]["order"] == 0
+
+
+def test_serialize_document_drops_the_stamped_key():
+    store, _, _ = make_store()
+    doc = Document(page_content="x", metadata={"source": "a.pdf", "doc_id": "k0"})
+    assert "doc_id" not in store.serialize_document(doc)["metadata"]
+
+
+def test_upserts_are_split_at_write_batch_size():
+    store, _, _ = make_store(write_batch_size=2)
+    statements = list(store._upsert_statements(pairs(5)))
+    assert [count for _, count in statements] == [2, 2, 1]
+    for stmt, count in statements:
+        compiled = compile_pg(stmt)
+        sql = str(compiled)
+        assert sql.startswith("INSERT INTO docstore (key, value) VALUES")
+        assert "ON CONFLICT (key) DO UPDATE SET value = excluded.value" in sql
+        assert sum(name.startswith("key_m") for name in compiled.params) == count
+    keys = [
+        value for stmt, _ in statements
+        for name, value in compile_pg(stmt).params.items() if name.startswith("key_m")
+    ]
+    assert keys == [f"k{i}" for i in range(5)]
+
+
+def test_upserts_dedupe_keys_keeping_the_last_value():
+    store, _, _ = make_store()
+    duplicated = pairs(2) + [("k0", Document(page_content="new", metadata={"source": "a.pdf"}))]
+    [(stmt, count)] = store._upsert_statements(duplicated)
+    assert count == 2
+    values = [v for name, v in compile_pg(stmt).params.items() if name.startswith("value_m")]
+    assert [value["page_content"] for value in values] == ["new", "chunk 1"]
+
+
+def test_mset_writes_every_batch_in_one_transaction():
+    store, session, async_session = make_store(write_batch_size=2)
+    assert store.mset(pairs(5)) == 5
+    assert len(session.statements) == 3 and session.committed
+    assert asyncio.run(store.amset(pairs(5))) == 5
+    assert len(async_session.statements) == 3 and async_session.committed
+
+
+def test_mset_rolls_back_and_raises_on_failure():
+    store, session, async_session = make_store(fail=True)
+    with pytest.raises(RuntimeError):
+        store.mset(pairs(2))
+    assert session.rolled_back and not session.committed
+    with pytest.raises(RuntimeError):
+        asyncio.run(store.amset(pairs(2)))
+    assert async_session.rolled_back and not async_session.committed
+
+
+def test_mget_preserves_key_order_and_returns_none_for_misses():
+    rows = [
+        ("k2", {"page_content": "two", "metadata": {"source": "a.pdf"}}),
+        ("k0", {"page_content": "zero", "metadata": {"source": "a.pdf"}}),
+    ]
+    store, _, _ = make_store(rows)
+    keys = ["k0", "missing", "k2"]
+    for documents in (store.mget(keys), asyncio.run(store.amget(keys))):
+        assert [doc and doc.page_content for doc in documents] == ["zero", None, "two"]
+        assert [doc and doc.metadata["doc_id"] for doc in documents] == ["k0", None, "k2"]
+
+
+def test_keys_by_values_are_aligned_with_the_values():
+    rows = [("a.pdf", 2, "k2"), ("a.pdf", 0, "k0")]
+    store, _, async_session = make_store(rows)
+    values = [
+        Document(page_content="", metadata={"source": "a.pdf", "order": 0}),
+        Document(page_content="", metadata={"source": "a.pdf"}),
+        Document(page_content="", metadata={"source": "a.pdf", "order": 1}),
+        Document(page_content="", metadata={"source": "a.pdf", "order": 2}),
+    ]
+    assert asyncio.run(store.aget_keys_by_values(values)) == ["k0", None, None, "k2"]
+    assert store.get_keys_by_values([{"metadata": v.metadata} for v in values]) == ["k0", None, None, "k2"]
+    # One query for all lookups
+    assert len(async_session.statements) == 1
+
+
+def test_neighbors_and_unstamped_keys_are_fetched_in_one_query():
+    rows = [
+        ("a.pdf", 0, "k0", {"page_content": "zero", "metadata": {"source": "a.pdf", "order": 0}}),
+        ("a.pdf", 1, "k1", {"page_content": "one", "metadata": {"source": "a.pdf", "order": 1}}),
+        ("a.pdf", 2, "k2", {"page_content": "two", "metadata": {"source": "a.pdf", "order": 2}}),
+    ]
+    store, _, async_session = make_store(rows)
+    documents = [
+        # Fetched through the store: already carries its key
+        Document(page_content="one", metadata={"doc_id": "k1", "prev_key": "k0", "next_key": "k2"}),
+        # Needs its key resolved from (source, order)
+        Document(page_content="zero", metadata={"source": "a.pdf", "order": 0, "next_key": "k1"}),
+    ]
+    keys, neighbors = asyncio.run(store.amget_neighbors(documents))
+    assert keys == ["k1", "k0"]
+    assert set(neighbors) == {"k0", "k1", "k2"}
+    assert neighbors["k2"].page_content == "two"
+    assert neighbors["k2"].metadata["doc_id"] == "k2"
+    assert len(async_session.statements) == 1
+
+
+def test_neighbors_without_lookups_skip_the_query():
+    store, _, async_session = make_store()
+    documents = [Document(page_content="x", metadata={"doc_id": "k0"})]
+    assert asyncio.run(store.amget_neighbors(documents)) == (["k0"], {})
+    assert async_session.statements == []
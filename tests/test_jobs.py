@@ -0,0 +1,34 @@
+import asyncio
+
+from src.jobs import IngestionQueue
+
+
+def test_reserved_filename_stays_claimed_until_its_job_finishes():
+    queue = IngestionQueue(max_size=4, concurrency=1)
+    finish = asyncio.Event()
+
+    async def handler(job):
+        await finish.wait()
+
+    async def scenario():
+        await queue.start()
+        assert queue.reserve("a.pdf")
+        # A concurrent upload of the same name is rejected while the first uploads
+        assert not queue.reserve("a.pdf")
+        job = queue.submit("a.pdf", handler)
+        queue.release("a.pdf")
+        assert not queue.reserve("a.pdf")
+        finish.set()
+        while not job.done:
+            await asyncio.sleep(0.01)
+        assert queue.reserve("a.pdf")
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_released_reservation_can_be_claimed_again():
+    queue = IngestionQueue(max_size=4, concurrency=1)
+    assert queue.reserve("a.pdf")
+    queue.release("a.pdf")
+    assert queue.reserve("a.pdf")
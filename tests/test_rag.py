@@ -0,0 +1,90 @@
+import asyncio
+
+from src.rag import RAGPipeline
+
+
+class FakeProcessor:
+    def __init__(self, rewrite: str):
+        self.rewrite = rewrite
+
+    async def query_rewrite(self, message, chat_history=None):
+        # Give the speculative retrieval a chance to start
+        await asyncio.sleep(0.01)
+        return self.rewrite, ""
+
+
+class RecordingPipeline(RAGPipeline):
+    def __init__(self, processor):
+        super().__init__(processor=processor, loader=None, vectorstore=None)
+        self.started = []
+        self.finished = []
+
+    async def retrieve(self, query, expand_context=False):
+        self.started.append(query)
+        await asyncio.sleep(0.05)
+        self.finished.append(query)
+        return [{"key": query, "name": query, "page": None, "content": query}]
+
+
+def test_speculative_retrieval_is_reused_when_the_rewrite_matches():
+    pipeline = RecordingPipeline(FakeProcessor("What is RAG?"))
+    rewritten, _, sources, cached, _ = asyncio.run(
+        pipeline.rewrite_and_retrieve("what is rag", speculative=True)
+    )
+    assert rewritten == "What is RAG?"
+    assert cached is None
+    assert pipeline.started == ["what is rag"]
+    assert [s["key"] for s in sources] == ["what is rag"]
+
+
+def test_speculative_retrieval_is_cancelled_when_the_rewrite_differs():
+    pipeline = RecordingPipeline(FakeProcessor("How are documents chunked for indexing?"))
+
+    async def scenario():
+        result = await pipeline.rewrite_and_retrieve("and chunking?", speculative=True)
+        await asyncio.sleep(0.1)
+        return result
+
+    rewritten, _, sources, cached, _ = asyncio.run(scenario())
+    assert cached is None
+    assert pipeline.started == ["and chunking?", rewritten]
+    # The speculative retrieval was cancelled, only the rewritten one completed
+    assert pipeline.finished == [rewritten]
+    assert [s["key"] for s in sources] == [rewritten]
+
+
+def test_without_speculation_only_the_rewrite_is_retrieved():
+    pipeline = RecordingPipeline(FakeProcessor("What is RAG?"))
+    asyncio.run(pipeline.rewrite_and_retrieve("what is rag", speculative=False))
+    assert pipeline.started == ["What is RAG?"]
+
+
+def test_parent_child_split_links_children_to_their_parent():
+    from langchain.retrievers import ParentDocumentRetriever
+    from langchain.storage import InMemoryStore
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from langchain_core.vectorstores import InMemoryVectorStore
+
+    retriever = ParentDocumentRetriever(
+        vectorstore=InMemoryVectorStore(DeterministicFakeEmbedding(size=8)),
+        docstore=InMemoryStore(),
+        parent_splitter=RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=0),
+        child_splitter=RecursiveCharacterTextSplitter(chunk_size=50, chunk_overlap=0),
+    )
+    pipeline = RAGPipeline(processor=None, loader=None, vectorstore=None, index_retriever=retriever)
+    text = " ".join(f"word{i}" for i in range(200))
+    documents = [Document(page_content=text, metadata={"source": "a.txt", "page": 0})]
+
+    children, parents = pipeline._split_parent_child(documents)
+
+    assert len(parents) > 1
+    assert all(len(parent.page_content) <= 200 for _, parent in parents)
+    assert all(len(child.page_content) <= 50 for child in children)
+    parent_ids = {parent_id for parent_id, _ in parents}
+    assert len(parent_ids) == len(parents)
+    for child in children:
+        parent = dict(parents)[child.metadata["doc_id"]]
+        assert child.page_content in parent.page_content
+        assert child.metadata["source"] == "a.txt"
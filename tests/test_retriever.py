@@ -0,0 +1,128 @@
+import asyncio
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from benchmarks.fakes import OverlapCrossEncoder
+from src.cache import RerankScoreCache
+from src.retriever import CascadeRerankRetriever, CachedCrossEncoderReranker
+
+QUERY = "solar panel efficiency"
+# (content, source, fusion score), in fusion order
+CORPUS = [
+    ("solar panel efficiency report", "a.pdf", 0.9),
+    ("solar panel installation", "a.pdf", 0.8),
+    ("panel discussion notes", "b.pdf", 0.7),
+    ("wind turbine maintenance", "b.pdf", 0.6),
+    ("coal plant emissions", "c.pdf", 0.5),
+    ("river delta sediment", "c.pdf", 0.4),
+]
+
+
+class CountingCrossEncoder(OverlapCrossEncoder):
+    def __init__(self):
+        super().__init__()
+        self.pairs_scored = 0
+
+    def score(self, text_pairs):
+        self.pairs_scored += len(text_pairs)
+        return super().score(text_pairs)
+
+
+class FixedVectorStore(VectorStore):
+    """
+    Returns the corpus with its fusion scores for any query.
+    """
+    def __init__(self, corpus):
+        self.hits = [
+            (Document(page_content=content, metadata={"source": source}), score)
+            for content, source, score in corpus
+        ]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.hits[:k]
+
+    async def asimilarity_search_with_score(self, query, k=4, **kwargs):
+        return self.hits[:k]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.hits[:k]]
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError
+
+
+def cascade(model, corpus=CORPUS, **kwargs):
+    params = dict(top_n=2, min_k=2, max_k=10, score_ratio=0.0, batch_size=2, margin=0.1)
+    params.update(kwargs)
+    return CascadeRerankRetriever(vectorstore=FixedVectorStore(corpus), model=model, **params)
+
+
+def full_rerank(corpus=CORPUS, top_n=2):
+    documents = [Document(page_content=content, metadata={"source": source}) for content, source, _ in corpus]
+    reranker = CachedCrossEncoderReranker(model=OverlapCrossEncoder(), top_n=top_n)
+    return [doc.page_content for doc in reranker.compress_documents(documents, QUERY)]
+
+
+def test_cascade_matches_full_rerank_and_exits_early():
+    model = CountingCrossEncoder()
+    results = cascade(model).invoke(QUERY)
+    assert [doc.page_content for doc in results] == full_rerank()
+    assert model.pairs_scored < len(CORPUS)
+    assert results[0].metadata["rerank_score"] > results[1].metadata["rerank_score"]
+
+
+def test_async_cascade_matches_full_rerank():
+    model = CountingCrossEncoder()
+    results = asyncio.run(cascade(model).ainvoke(QUERY))
+    assert [doc.page_content for doc in results] == full_rerank()
+    assert model.pairs_scored < len(CORPUS)
+
+
+def test_cascade_keeps_scoring_while_the_top_n_changes():
+    # The best match comes last in fusion order, so no batch may end the cascade early
+    corpus = list(reversed(CORPUS))
+    model = CountingCrossEncoder()
+    results = cascade(model, corpus=corpus).invoke(QUERY)
+    assert [doc.page_content for doc in results] == full_rerank(corpus)
+    assert model.pairs_scored == len(CORPUS)
+
+
+def test_candidate_count_adapts_to_the_fusion_scores():
+    retriever = cascade(OverlapCrossEncoder(), score_ratio=0.75, min_k=2, max_k=10)
+    hits = FixedVectorStore(CORPUS).hits
+    # Scores >= 0.75 x 0.9: the first three
+    assert len(retriever._select_candidates(hits)) == 3
+    retriever = cascade(OverlapCrossEncoder(), score_ratio=0.99, min_k=2, max_k=10)
+    assert len(retriever._select_candidates(hits)) == 2
+    retriever = cascade(OverlapCrossEncoder(), score_ratio=0.0, min_k=2, max_k=4)
+    assert len(retriever._select_candidates(hits)) == 4
+
+
+def test_cached_reranker_only_scores_missing_pairs():
+    model = CountingCrossEncoder()
+    cache = RerankScoreCache(max_entries=100)
+    documents = [Document(page_content=content, metadata={"source": source}) for content, source, _ in CORPUS]
+    reranker = CachedCrossEncoderReranker(model=model, top_n=2, cache=cache)
+    first = reranker.compress_documents(documents, QUERY)
+    second = reranker.compress_documents(documents, QUERY)
+    assert [d.page_content for d in first] == [d.page_content for d in second] == full_rerank()
+    assert model.pairs_scored == len(CORPUS)
+
+
+def test_invalidate_source_evicts_only_that_source():
+    model = CountingCrossEncoder()
+    cache = RerankScoreCache(max_entries=100)
+    documents = [Document(page_content=content, metadata={"source": source}) for content, source, _ in CORPUS]
+    scores = cache.score(model, QUERY, documents)
+
+    assert cache.invalidate_source("b.pdf") == 2
+    assert cache.stats()["entries"] == len(CORPUS) - 2
+    model.pairs_scored = 0
+    assert cache.score(model, QUERY, documents) == scores
+    # Only the evicted b.pdf pairs went back to the model
+    assert model.pairs_scored == 2
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from src.sparse import coo_to_sparse_vectors
+
+
+def naive_sparse_vectors(rows, cols, values, n_rows):
+    vectors = []
+    for row in range(n_rows):
+        summed = {}
+        for r, c, v in zip(rows, cols, values):
+            if r == row:
+                summed[int(c)] = summed.get(int(c), 0.0) + float(v)
+        indices = sorted(summed)
+        vectors.append((indices, [summed[i] for i in indices]))
+    return vectors
+
+
+def random_coo(rng, n_rows, vocab=50, max_entries=40):
+    n = int(rng.integers(0, max_entries))
+    rows = rng.integers(0, n_rows, size=n)
+    # A small vocabulary makes repeated (row, col) entries likely
+    cols = rng.integers(0, vocab, size=n)
+    values = rng.random(n).astype(np.float32)
+    return rows, cols, values
+
+
+def assert_matches_naive(rows, cols, values, n_rows):
+    vectors = coo_to_sparse_vectors(rows, cols, values, n_rows)
+    expected = naive_sparse_vectors(rows, cols, values, n_rows)
+    assert len(vectors) == n_rows
+    for vector, (indices, row_values) in zip(vectors, expected):
+        assert vector.indices == indices
+        assert vector.values == pytest.approx(row_values, rel=1e-5)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_a_naive_loop_on_random_input(seed):
+    rng = np.random.default_rng(seed)
+    n_rows = int(rng.integers(1, 10))
+    assert_matches_naive(*random_coo(rng, n_rows), n_rows)
+
+
+def test_repeated_indices_are_summed():
+    [vector] = coo_to_sparse_vectors([0, 0, 0], [7, 3, 7], [0.5, 1.0, 0.25], n_rows=1)
+    assert vector.indices == [3, 7]
+    assert vector.values == pytest.approx([1.0, 0.75])
+
+
+def test_empty_rows_at_the_batch_boundaries():
+    # Rows 0, 2, 3 and 5 are empty, including the first and last of the batch
+    rows, cols, values = [4, 1, 4, 1], [2, 9, 1, 9], [1.0, 2.0, 3.0, 4.0]
+    vectors = coo_to_sparse_vectors(rows, cols, values, n_rows=6)
+    assert [v.indices for v in vectors] == [[], [9], [], [], [1, 2], []]
+    assert_matches_naive(rows, cols, values, n_rows=6)
+
+
+def test_an_all_empty_batch():
+    vectors = coo_to_sparse_vectors([], [], [], n_rows=3)
+    assert [(v.indices, v.values) for v in vectors] == [([], [])] * 3
+
+
+def test_batches_convert_like_the_whole_input():
+    rng = np.random.default_rng(0)
+    rows, cols, values = random_coo(rng, n_rows=10, max_entries=200)
+    whole = coo_to_sparse_vectors(rows, cols, values, n_rows=10)
+    batched = []
+    for start in range(0, 10, 4):
+        mask = (rows >= start) & (rows < start + 4)
+        n_rows = min(4, 10 - start)
+        batched.extend(coo_to_sparse_vectors(rows[mask] - start, cols[mask], values[mask], n_rows))
+    assert [(v.indices, v.values) for v in batched] == [(v.indices, v.values) for v in whole]
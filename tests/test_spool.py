@@ -0,0 +1,103 @@
+import io
+import os
+import asyncio
+
+import pytest
+
+from benchmarks.fakes import InMemoryMinioClient
+from src.minio_client import MinioClient
+from src.spool import TeeReader, UploadSpool, spool_upload
+
+
+class FailingReader(io.BytesIO):
+    """
+    Source that fails once `fail_after` bytes were read, like a dropped upload.
+    """
+    def __init__(self, data: bytes, fail_after: int):
+        super().__init__(data)
+        self.fail_after = fail_after
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or self.tell() + size > self.fail_after:
+            raise ConnectionError("client disconnected")
+        return super().read(size)
+
+
+class ChunkedMinioClient(InMemoryMinioClient):
+    """
+    Reads uploads in parts, as the real client does for multipart uploads.
+    """
+    def _put(self, bucket_name, object_name, data):
+        parts = []
+        while part := data.read(1024):
+            parts.append(part)
+        with self._lock:
+            self.objects[(bucket_name, object_name)] = b"".join(parts)
+
+
+class RecordingMinio:
+    def __init__(self):
+        self.calls = []
+
+    def bucket_exists(self, bucket_name):
+        return True
+
+    def put_object(self, **kwargs):
+        kwargs["body"] = kwargs["data"].read()
+        self.calls.append(kwargs)
+
+
+def test_tee_copies_every_chunk_to_the_sink():
+    data = os.urandom(100_000)
+    sink = io.BytesIO()
+    reader = TeeReader(io.BytesIO(data), sink)
+    chunks = []
+    while chunk := reader.read(4096):
+        chunks.append(chunk)
+    assert b"".join(chunks) == data
+    assert sink.getvalue() == data
+    assert reader.bytes_read == len(data)
+
+
+def test_spooled_bytes_equal_uploaded_bytes(tmp_path):
+    data = os.urandom(3 * 1024 * 1024 + 17)
+    mc = InMemoryMinioClient()
+    spool = asyncio.run(spool_upload(mc, "bucket", "obj", io.BytesIO(data), "a.pdf", root=str(tmp_path)))
+    try:
+        assert mc.objects[("bucket", "obj")] == data
+        with open(spool.path, "rb") as f:
+            assert f.read() == data
+        assert os.path.basename(spool.path) == "a.pdf"
+    finally:
+        spool.cleanup()
+    assert not os.path.exists(spool.dir)
+
+
+def test_failed_upload_removes_the_partial_spool(tmp_path):
+    mc = ChunkedMinioClient()
+    source = FailingReader(os.urandom(10_000), fail_after=4096)
+    with pytest.raises(ConnectionError):
+        asyncio.run(spool_upload(mc, "bucket", "obj", source, "a.pdf", root=str(tmp_path)))
+    assert os.listdir(tmp_path) == []
+    assert mc.objects == {}
+
+
+def test_spools_of_the_same_filename_do_not_clobber(tmp_path):
+    first, second = UploadSpool("a.pdf", root=str(tmp_path)), UploadSpool("a.pdf", root=str(tmp_path))
+    assert first.path != second.path
+    first.cleanup()
+    second.cleanup()
+    assert os.listdir(tmp_path) == []
+
+
+def test_upload_stream_uses_unknown_length_multipart():
+    mc = MinioClient("localhost:9000", "key", "secret", part_size=5 * 1024 * 1024, parallel_parts=3)
+    mc.client = RecordingMinio()
+    data = os.urandom(1000)
+    mc.upload_stream("bucket", "obj", io.BytesIO(data), content_type="application/pdf")
+    [call] = mc.client.calls
+    assert call["length"] == -1
+    assert call["part_size"] == 5 * 1024 * 1024
+    assert call["num_parallel_uploads"] == 3
+    assert call["content_type"] == "application/pdf"
+    assert call["body"] == data
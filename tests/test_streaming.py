@@ -0,0 +1,74 @@
+import time
+import asyncio
+
+from src.streaming import coalesce
+
+
+class TokenStream:
+    """
+    Async token stream yielding `tokens` every `delay` seconds, recording aclose.
+    """
+    def __init__(self, tokens, delay=0.0):
+        self.tokens = list(tokens)
+        self.delay = delay
+        self.sent = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.sent == len(self.tokens):
+            raise StopAsyncIteration
+        await asyncio.sleep(self.delay)
+        self.sent += 1
+        return self.tokens[self.sent - 1]
+
+    async def aclose(self):
+        self.closed = True
+
+
+async def collect(stream, **kwargs):
+    return [frame async for frame in coalesce(stream, **kwargs)]
+
+
+def test_frames_preserve_the_content():
+    tokens = [f"tok{i} " for i in range(100)]
+    stream = TokenStream(tokens, delay=0.001)
+    frames = asyncio.run(collect(stream, interval_ms=20, max_bytes=10_000))
+    assert "".join(frames) == "".join(tokens)
+    assert 1 < len(frames) < len(tokens)
+    assert stream.closed
+
+
+def test_frames_are_cut_at_max_bytes():
+    tokens = ["abcd"] * 10
+    frames = asyncio.run(collect(TokenStream(tokens), interval_ms=10_000, max_bytes=8))
+    assert frames == ["abcdabcd"] * 5
+
+
+def test_a_slow_stream_is_sent_token_by_token():
+    tokens = ["a", "b", "c"]
+    frames = asyncio.run(collect(TokenStream(tokens, delay=0.05), interval_ms=5, max_bytes=10_000))
+    assert frames == tokens
+
+
+def test_the_stop_flag_closes_the_stream_promptly():
+    stopped = False
+    stream = TokenStream(["x"] * 1000, delay=0.01)
+
+    async def scenario():
+        nonlocal stopped
+        frames = []
+        start = time.monotonic()
+        async for frame in coalesce(stream, interval_ms=20, max_bytes=10_000, stop=lambda: stopped):
+            frames.append(frame)
+            stopped = True
+        return frames, time.monotonic() - start
+
+    frames, elapsed = asyncio.run(scenario())
+    assert len(frames) == 1
+    # Checked within an interval instead of draining the 10s stream
+    assert elapsed < 0.5
+    assert stream.sent < 20
+    assert stream.closed